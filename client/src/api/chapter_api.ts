@@ -36,13 +36,20 @@ export const chapterApi = {
     })
   },
 
-  // 生成章节内容
-  generateChapter(params: GenerateChapterParams & { signal?: AbortSignal }) {
-    return request.stream('/chapter/generate', params, {
-      signal: params.signal
+  // 生成章节内容（SSE），传入 lastEventId 时从该事件之后续传
+  generateChapter(params: GenerateChapterParams & { signal?: AbortSignal, lastEventId?: string }) {
+    const { signal, lastEventId, ...data } = params
+    return request.stream('/chapter/generate', data, {
+      signal,
+      headers: lastEventId ? { 'Last-Event-ID': lastEventId } : undefined
     })
   },
 
+  // 停止生成，取消服务端的生成任务
+  cancelGenerate(streamId: string) {
+    return request.post('/chapter/generate_cancel', { stream_id: streamId })
+  },
+
   // 保存章节内容
   saveChapterContent(params: SaveChapterParams) {
     return request.post('/chapter/save', params)
@@ -63,6 +70,16 @@ export const chapterApi = {
     })
   },
 
+  /**
+   * 流式分割章节内容，每完成一块推送一次进度（SSE）
+   */
+  splitChapterStream(projectName: string, chapterName: string, signal?: AbortSignal) {
+    return request.stream('/chapter/split_text_stream', {
+      project_name: projectName,
+      chapter_name: chapterName
+    }, { signal })
+  },
+
   // 提取章节中的角色
   extractCharacters(projectName: string, chapterName: string) {
     return request.post('/chapter/extract_characters', {
@@ -1,4 +1,5 @@
 import request from './request'
+import config from '@/config'
 
 interface GenerateImageParams {
   project_name: string
@@ -27,6 +28,14 @@ interface GenerateAudioParams {
   }[]
 }
 
+export interface ChapterSpriteMap {
+  key: string
+  tile: number
+  columns: number
+  sheets: { width: number; height: number }[]
+  spans: Record<string, { sheet: number; x: number; y: number; w: number; h: number }>
+}
+
 interface GenerationProgressResponse {
   status: string
   current: number
@@ -49,6 +58,19 @@ export const mediaApi = {
 
   cancelTask(taskId: string) {
     return request.post('/media/cancel', { task_id: taskId })
+  },
+
+  getChapterSpriteMap(projectName: string, chapterName: string, tile = 160) {
+    return request.get<ChapterSpriteMap>('/media/chapter_sprite_map', {
+      project_name: projectName,
+      chapter_name: chapterName,
+      tile
+    })
+  },
+
+  // 精灵图地址，内容由 key 唯一确定，浏览器可长期缓存
+  getChapterSpriteUrl(projectName: string, chapterName: string, key: string, sheet = 0) {
+    return `${config.baseApi}/media/chapter_sprite?project_name=${projectName}&chapter_name=${chapterName}&key=${key}&sheet=${sheet}`
   }
 }
 
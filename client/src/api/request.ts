@@ -28,6 +28,11 @@ export interface ApiResponse<T = any> {
     message?: string
 }
 
+// 流式请求被服务端拒绝（返回了普通 JSON 响应），message 为服务端的错误信息
+export class StreamResponseError extends Error {
+    name = 'StreamResponseError'
+}
+
 // 响应拦截器
 service.interceptors.response.use(
     (res: AxiosResponse<ApiResponse>) => {
@@ -119,8 +124,13 @@ class HttpClient {
             },
             body: data ? JSON.stringify(data) : undefined,
             signal: options.signal
-        }).then(response => {
+        }).then(async response => {
             if (!response.ok) throw new Error(`HTTP错误: ${response.status}`);
+            // 参数错误、续传过期等情况服务端返回普通 JSON，而不是事件流
+            if (!(response.headers.get('content-type') || '').includes('text/event-stream')) {
+                const result = await response.json().catch(() => null);
+                throw new StreamResponseError(result?.msg || '无效的流式响应');
+            }
             if (!response.body) throw new Error('无效的流式响应');
             return response.body as unknown as T;
         });
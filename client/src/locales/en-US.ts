@@ -137,12 +137,14 @@ export default {
     splitChapter: 'Split Current Chapter',
     splitChapterSuccess: 'Chapter split successfully',
     splitChapterError: 'Failed to split chapter',
+    splitProgress: 'Splitting {done}/{total}',
     addChapter: 'Add Chapter',
     continueMode: 'Continue Mode',
     createMode: 'Create Mode',
     useLastChapter: 'Reference Last Chapter',
     write: 'Write',
     stop: 'Stop',
+    generateError: 'Generation failed',
     continuePlaceholder: 'Enter text content, then click Write',
     createPlaceholder: 'Enter creation requirements, then click Write',
     chapterCreated: 'Chapter created successfully',
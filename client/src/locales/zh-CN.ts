@@ -131,12 +131,14 @@ export default {
     splitChapter: '分割当前章节',
     splitChapterSuccess: '章节分割成功',
     splitChapterError: '章节分割失败',
+    splitProgress: '分割中 {done}/{total}',
     addChapter: '新增章节',
     continueMode: '续写模式',
     createMode: '创作模式',
     useLastChapter: '引用上一章',
     write: '生成',
     stop: '中断',
+    generateError: '生成失败',
     continuePlaceholder: '请输入需要续写的文本内容，然后点击生成按钮',
     createPlaceholder: '请输入创作要求，然后点击生成按钮',
     chapterCreated: '章节创建成功',
@@ -5,14 +5,16 @@ import config from '@/config'
  * @param projectName 项目名称
  * @param chapterName 章节名称
  * @param spanIndex span索引
- * @param type 资源类型 ('image' | 'audio')
+ * @param type 资源类型 ('image' | 'thumbnail' | 'audio')
+ * @param version 缩略图的版本号（如图片的修改时间），带上后浏览器可长期缓存；不带时每次协商缓存
  * @returns 完整的资源访问路径
  */
 export const getResourcePath = (
   projectName: string,
   chapterName: string,
   spanId?: number,
-  type: 'image' | 'audio' |'video'= 'image'
+  type: 'image' | 'thumbnail' | 'audio' |'video'= 'image',
+  version?: string
 ): string => {
   const timestamp = Date.now()
   let endpoint=''
@@ -20,6 +22,9 @@ export const getResourcePath = (
     case 'image':
       endpoint = '/media/get_image'
       break;
+    case 'thumbnail':
+      endpoint = '/media/get_thumbnail'
+      break;
     case 'audio':
       endpoint = '/media/get_audio'
       break;
@@ -27,6 +32,11 @@ export const getResourcePath = (
       endpoint='/video/get_video'
       break;
   }
+  if (type === 'thumbnail') {
+    // 缩略图的地址保持稳定，由版本号区分内容，服务端据此返回长期缓存或 ETag
+    const query = `project_name=${projectName}&chapter_name=${chapterName}&span_id=${spanId}`
+    return `${config.baseApi}${endpoint}?${query}${version ? `&v=${encodeURIComponent(version)}` : ''}`
+  }
   if(type!=='video')
     return `${config.baseApi}${endpoint}?project_name=${projectName}&chapter_name=${chapterName}&span_id=${spanId}&_t=${timestamp}`
   else
@@ -1,6 +1,7 @@
 import os
 import yaml
 from typing import Dict, Any
+from server.utils.workflow_registry import get_workflow_registry
 
 config = {}  # 所有模块共享的全局字典对象
 config_listeners = []  # 配置更新监听器列表
@@ -32,11 +33,14 @@ def load_config() -> Dict[str, Any]:
     if 'relative_workflow_path' in config and 'workflow_path' not in config:
         config['workflow_path'] = os.path.abspath(os.path.join(server_dir, config['relative_workflow_path']))
     
-    # 扫描工作流文件
+    if 'relative_cache_path' in config and 'cache_path' not in config:
+        config['cache_path'] = os.path.abspath(os.path.join(server_dir, config['relative_cache_path']))
+    
+    # 工作流文件列表（由工作流索引提供，只在文件变化时重新解析）
     workflow_path = config.get('workflow_path', '')
     config['all_workflow'] = []
     if os.path.exists(workflow_path) and os.path.isdir(workflow_path):
-        config['all_workflow'] = [f for f in os.listdir(workflow_path) if f.endswith('.json')]
+        config['all_workflow'] = get_workflow_registry(workflow_path).names()
     
     return config
 
@@ -78,7 +82,7 @@ def update_config(updates: Dict[str, Any]) -> Dict[str, Any]:
     # 创建基础配置副本（过滤计算属性）
     filtered_config = {
         k: v for k, v in config.items()
-        if k not in ['projects_path', 'prompts_path', 'workflow_path', 'all_workflow']
+        if k not in ['projects_path', 'prompts_path', 'workflow_path', 'cache_path', 'all_workflow']
     }
     
     # 处理嵌套更新
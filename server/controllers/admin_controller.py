@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from server.config.config import load_config, update_config
 from server.utils.response import make_response
+from server.services.llm_service import LLMService
 
 router = APIRouter(prefix='/admin')
 
@@ -36,3 +37,41 @@ async def update_configuration(request: Request):
         )
     except Exception as e:
         return make_response(status='error', msg=f'更新配置时发生错误：{str(e)}')
+
+@router.get('/llm_cache')
+async def get_llm_cache_stats():
+    """获取 LLM 响应缓存的命中统计"""
+    try:
+        cache = LLMService().response_cache
+        if cache is None:
+            return make_response(data={'enabled': False}, msg='LLM 响应缓存未启用')
+        return make_response(data={'enabled': True, **cache.stats()}, msg='获取缓存统计成功')
+    except Exception as e:
+        return make_response(status='error', msg=f'获取缓存统计时发生错误：{str(e)}')
+
+@router.post('/llm_cache/clear')
+async def clear_llm_cache():
+    """清空 LLM 响应缓存"""
+    try:
+        cache = LLMService().response_cache
+        if cache is not None:
+            cache.clear()
+        return make_response(msg='缓存已清空')
+    except Exception as e:
+        return make_response(status='error', msg=f'清空缓存时发生错误：{str(e)}')
+
+@router.get('/llm_limiter')
+async def get_llm_limiter_stats():
+    """获取 LLM 限流器的状态"""
+    try:
+        return make_response(data=LLMService().limiter.stats(), msg='获取限流状态成功')
+    except Exception as e:
+        return make_response(status='error', msg=f'获取限流状态时发生错误：{str(e)}')
+
+@router.get('/llm_streams')
+async def get_llm_stream_stats():
+    """获取流式生成的统计（开始、完成、取消、失败次数）"""
+    try:
+        return make_response(data=dict(LLMService().stream_stats), msg='获取流式生成统计成功')
+    except Exception as e:
+        return make_response(status='error', msg=f'获取流式生成统计时发生错误：{str(e)}')
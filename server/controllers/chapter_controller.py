@@ -5,6 +5,7 @@ from server.config.config import load_config, register_config_listener
 import json
 from datetime import datetime
 from server.utils.response import make_response
+from server.utils.sse import SSEStreamRegistry, coalesce, format_event
 import re
 
 from server.services.llm_service import LLMService
@@ -15,6 +16,7 @@ from fastapi.responses import StreamingResponse
 router = APIRouter(prefix='/chapter')
 llm_service = LLMService()
 chapter_file_server = ChapterFileService()
+sse_streams = SSEStreamRegistry(grace=(load_config().get('sse') or {}).get('resume_grace', 15))
 
 # 注册配置更新监听器
 def on_config_update():
@@ -22,6 +24,7 @@ def on_config_update():
     # 重新初始化服务
     llm_service = LLMService()
     chapter_file_server = ChapterFileService()
+    sse_streams.grace = (load_config().get('sse') or {}).get('resume_grace', 15)
 
 register_config_listener(on_config_update)
 
@@ -57,7 +60,12 @@ async def create_chapter(request: Request):
 
 @router.post('/generate')
 async def generate_chapter(request: Request):
-    """生成章节内容"""
+    """生成章节内容
+
+    以 SSE 推送生成的文本：token 按 sse 配置合并后发送，事件 id 为 ``<流 id>:<序号>``，生成结束时发送 done 事件。
+    客户端断开后生成继续运行 sse.resume_grace 秒（默认 15），期间带上 Last-Event-ID 请求头重新请求即可从断点续传，
+    无人重连才取消上游调用；设为 0 时断开即取消，不支持续传。主动停止请调用 /generate_cancel，立即取消。
+    """
     data = await request.json()
     project_name = data.get('project_name')
     chapter_name = data.get('chapter_name')
@@ -65,42 +73,58 @@ async def generate_chapter(request: Request):
     is_continuation = data.get('is_continuation', False)
     use_last_chapter = data.get('use_last_chapter', True)
 
-    if not all([project_name, chapter_name, prompt]):
-        return make_response(status='error', msg='缺少必要参数')
-
     try:
-        config = load_config()
-        projects_path = config.get('projects_path', 'projects/')
-        chapter_path = os.path.join(projects_path, project_name, chapter_name)
+        last_event_id = request.headers.get('last-event-id')
+        if last_event_id:
+            # 续传：接回仍在运行或刚结束的生成
+            stream, after = sse_streams.resolve(last_event_id)
+            if stream is None:
+                return make_response(status='error', msg='生成任务已结束或已过期，无法续传')
+        else:
+            if not all([project_name, chapter_name, prompt]):
+                return make_response(status='error', msg='缺少必要参数')
 
-        if not os.path.exists(chapter_path):
-            return make_response(status='error', msg='章节路径不存在')
+            config = load_config()
+            projects_path = config.get('projects_path', 'projects/')
+            chapter_path = os.path.join(projects_path, project_name, chapter_name)
 
-        # 获取上一章内容作为上下文
-        if use_last_chapter:
-            last_content = chapter_file_server.get_chapter_content(project_name, f'chapter{int(chapter_name[7:]) - 1}')
-        else:
-            last_content = ''
+            if not os.path.exists(chapter_path):
+                return make_response(status='error', msg='章节路径不存在')
+
+            # 获取上一章内容作为上下文
+            if use_last_chapter:
+                last_content = chapter_file_server.get_chapter_content(project_name, f'chapter{int(chapter_name[7:]) - 1}')
+            else:
+                last_content = ''
+
+            if is_continuation:
+                generator =llm_service.continue_story(prompt, project_name, last_content)
+            else:
+                generator =llm_service.generate_text(prompt, project_name, last_content)
+
+            sse_config = config.get('sse') or {}
+            stream = sse_streams.start(coalesce(
+                generator,
+                max_chars=sse_config.get('coalesce_chars', 64),
+                max_delay=sse_config.get('coalesce_ms', 50) / 1000
+            ))
+            after = 0
         
         # 创建一个生成器
         async def event_stream():
             try:
-                if is_continuation:
-                    generator =llm_service.continue_story(prompt, project_name, last_content)
-                else:
-                    generator =llm_service.generate_text(prompt, project_name, last_content)
-
-                async for generated_text in generator:
+                async for seq, text in stream.subscribe(after):
                     if await request.is_disconnected():
                         break
-                    yield f"data: {generated_text}\n\n"
+                    yield format_event(text, event_id=f"{stream.id}:{seq}")
+                else:
+                    if stream.error:
+                        yield format_event(stream.error, event='error')
+                    elif not stream.cancelled:
+                        yield format_event('[DONE]', event='done')
             except asyncio.CancelledError:
-                # 处理客户端断开连接
+                # 处理客户端断开连接，最后一个订阅者离开后按 resume_grace 取消生成
                 print("客户端中断了连接")
-            finally:
-                # 执行必要的清理操作
-                if 'generator' in locals():
-                    await generator.aclose()
 
         return StreamingResponse(
             event_stream(),
@@ -116,6 +140,17 @@ async def generate_chapter(request: Request):
     except Exception as e:
         return make_response(status='error', msg=str(e))
 
+@router.post('/generate_cancel')
+async def cancel_generate(request: Request):
+    """停止生成，立即取消上游的 LLM 调用"""
+    data = await request.json()
+    stream_id = data.get('stream_id')
+    if not stream_id:
+        return make_response(status='error', msg='缺少必要参数')
+    if not sse_streams.cancel(stream_id):
+        return make_response(status='error', msg='生成任务不存在或已结束')
+    return make_response(msg='已停止生成')
+
 @router.post('/save')
 async def save_chapter_content(request: Request):
     """保存章节内容"""
@@ -176,6 +211,65 @@ async def split_text(request: Request):
     except Exception as e:
         return make_response(status='error', msg=f'分割文本时发生错误：{str(e)}')
 
+@router.post('/split_text_stream')
+async def split_text_stream(request: Request):
+    """流式分割文本：每完成一块就按顺序写入片段文件，并通过 SSE 推送进度"""
+    data = await request.json()
+    project_name = data.get('project_name')
+    chapter_name = data.get('chapter_name')
+
+    if not project_name or not chapter_name:
+        return make_response(status='error', msg='Missing project_name or chapter_name')
+
+    content = chapter_file_server.get_chapter_content(project_name, chapter_name)
+    if not content:
+        return make_response(status='error', msg=f'Content not found for chapter {chapter_name}')
+
+    def event(payload: dict) -> str:
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def event_stream():
+        generator = llm_service.iter_split_chunks(project_name, content)
+        written = 0
+        try:
+            yield event({'type': 'start'})
+            async for index, total, spans in generator:
+                if await request.is_disconnected():
+                    break
+                # 第一块完成时才清空旧的片段文件，场景提取期间原有内容仍可用
+                if index == 0:
+                    chapter_file_server.clear_span_files(project_name, chapter_name)
+                chapter_file_server.write_span_files(project_name, chapter_name, spans, start_index=written + 1)
+                yield event({
+                    'type': 'chunk',
+                    'chunk': index + 1,
+                    'total': total,
+                    'start': written + 1,
+                    'spans': spans
+                })
+                written += len(spans)
+            else:
+                logging.info(f"已为章节 {chapter_name} 生成 {written} 个场景文件")
+                yield event({'type': 'done', 'span_count': written})
+        except asyncio.CancelledError:
+            logging.info("客户端中断了分割连接")
+        except Exception as e:
+            logging.error(f"流式分割文本时出错: {str(e)}")
+            yield event({'type': 'error', 'msg': f'分割文本时发生错误：{str(e)}', 'span_count': written})
+        finally:
+            await generator.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Content-Type": "text/event-stream",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get('/list')
 async def get_chapter_list(project_name: str):
     """获取项目的所有章节列表"""
@@ -277,13 +371,21 @@ async def get_chapter_scene_list(project_name: str, chapter_name: str):
                 
             with open(prompt_file, 'r', encoding='utf-8') as f:
                 prompt_data = json.load(f)
+
+            # 图片版本号：主图的修改时间和大小，供缩略图地址长期缓存
+            image_path = os.path.join(span_dir, 'image.png')
+            image_version = ''
+            if os.path.exists(image_path):
+                stat = os.stat(image_path)
+                image_version = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
                 
             scene_list.append({
                 'id': str(item),
                 'content': content,
                 'base_scene': prompt_data.get('base_scene', ''),
                 'scene': prompt_data.get('scene', ''),
-                'prompt': prompt_data.get('prompt', '')
+                'prompt': prompt_data.get('prompt', ''),
+                'image_version': image_version
             })
             
         return make_response(status='success', data=scene_list)
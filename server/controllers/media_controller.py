@@ -3,7 +3,9 @@ from server.config.config import load_config
 from server.services.image_service import ImageService
 from server.services.audio_service import AudioService
 from server.utils.response import make_response
+from server.utils.image_derivatives import get_derivative, build_sprite_sheet, sprite_sheet_path
 import os
+import asyncio
 import datetime
 import logging
 from fastapi.responses import FileResponse
@@ -41,6 +43,11 @@ async def generate_images(request: Request):
         params['width']=width
         params['height']=height
         params['style']=style
+        if image_settings.get('seed'):
+            params['seed']=image_settings['seed']  # 固定种子，便于复用缓存
+        if image_settings.get('variants'):
+            params['variants']=image_settings['variants']  # 每个span生成的候选图数量
+            params['primary']=image_settings.get('primary', 1)
        
 
         # 构建输出路径数组
@@ -63,13 +70,17 @@ async def generate_images(request: Request):
         if not all(prompt_texts):
             return make_response(status='error', msg='prompts中存在空的prompt字段')
         
+        # 单张重绘默认走高优先级通道，可以插队到批量任务之前
+        priority = data.get('priority', 'high' if len(prompt_texts) == 1 else 'normal')
+        
         try:
             # 调用图像服务生成图片
             result = image_service.generate_images(
                 prompts=prompt_texts,
                 output_dirs=output_dirs,
                 workflow=workflow,
-                params=params
+                params=params,
+                priority=priority
             )
             return make_response(
                 data=result,
@@ -138,6 +149,31 @@ async def generate_audio(request: Request):
         logger.error(f"Error processing request: {str(e)}")
         return make_response(status='error', msg=f'处理请求时发生错误：{str(e)}')
 
+@router.get('/audio_jobs')
+async def list_audio_jobs(all: bool = False):
+    """列出持久化的音频任务，默认只返回可恢复（未完成）的任务。"""
+    try:
+        return make_response(data=audio_service.list_jobs(unfinished_only=not all))
+    except Exception as e:
+        logger.error(f"Error listing audio jobs: {str(e)}")
+        return make_response(status='error', msg=str(e))
+
+@router.post('/resume_audio')
+async def resume_audio(request: Request):
+    """恢复中断或失败的音频任务，只重新合成未完成的span。"""
+    try:
+        data = await request.json()
+        task_id = data.get('task_id')
+        if not task_id:
+            return make_response(status='error', msg='缺少任务ID')
+        result = await audio_service.resume_audio(task_id)
+        return make_response(data=result, msg='音频任务已恢复')
+    except ValueError as e:
+        return make_response(status='error', msg=str(e))
+    except Exception as e:
+        logger.error(f"Error resuming audio task: {str(e)}")
+        return make_response(status='error', msg=str(e))
+
 @router.get('/progress')
 async def get_generation_progress(task_id: str):
     """获取生成任务的进度。"""
@@ -211,12 +247,34 @@ async def get_workflow(workflow_name: str):
     except Exception as e:
         return make_response(status='error', msg=f'获取工作流时发生错误：{str(e)}')
 
+@router.post('/select_variant')
+async def select_variant(request: Request):
+    """将span的某张候选图设为主图。"""
+    try:
+        data = await request.json()
+        project_name = data.get('project_name')
+        chapter_name = data.get('chapter_name')
+        span_id = data.get('span_id')
+        variant = data.get('variant')
+
+        if not all([project_name, chapter_name, span_id, variant]):
+            return make_response(status='error', msg='缺少必要参数：project_name, chapter_name, span_id, variant')
+
+        span_path = os.path.join(config['projects_path'], project_name, chapter_name, str(span_id))
+        if not image_service.select_variant(span_path, int(variant)):
+            return make_response(status='error', msg='候选图不存在')
+        return make_response(msg='主图已更新')
+    except Exception as e:
+        logger.error(f"Error selecting variant: {str(e)}")
+        return make_response(status='error', msg=str(e))
+
 @router.get('/get_image')
-async def get_media_image(project_name: str, chapter_name: str, span_id: str):
-    """获取指定项目章节span的图片。"""
+async def get_media_image(project_name: str, chapter_name: str, span_id: str, variant: int = None):
+    """获取指定项目章节span的图片，指定variant时返回对应候选图。"""
     try:
         # 构建图片路径（与生成时的路径保持一致）
-        image_path = os.path.join(config['projects_path'], project_name, chapter_name, str(span_id), 'image.png')
+        image_name = f'image_{variant}.png' if variant else 'image.png'
+        image_path = os.path.join(config['projects_path'], project_name, chapter_name, str(span_id), image_name)
         logger.info(f"Trying to access image at: {image_path}")
             
         return FileResponse(image_path, media_type='image/png')
@@ -225,6 +283,81 @@ async def get_media_image(project_name: str, chapter_name: str, span_id: str):
         logger.error(f"Error accessing image: {str(e)}")
         return make_response(status='error', msg=str(e))
 
+@router.get('/get_thumbnail')
+async def get_media_thumbnail(request: Request, project_name: str, chapter_name: str, span_id: str,
+                              size: str = 'thumb', variant: int = None, v: str = None):
+    """获取span图片的WebP缩略图。
+
+    size 可以是 thumb / preview 或长边像素数；带上版本号 v（如场景列表返回的 image_version）时按不可变资源长期缓存，
+    否则每次用 ETag 协商。
+    """
+    try:
+        image_name = f'image_{variant}.png' if variant else 'image.png'
+        image_path = os.path.join(config['projects_path'], project_name, chapter_name, str(span_id), image_name)
+        thumbnail_path = await asyncio.to_thread(get_derivative, image_path, size)
+        if thumbnail_path is None:
+            return make_response(status='error', msg='图片不存在')
+
+        stat = os.stat(thumbnail_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = 'public, max-age=31536000, immutable' if v else 'public, no-cache'
+        headers = {'ETag': etag, 'Cache-Control': cache_control}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(thumbnail_path, media_type='image/webp', headers=headers)
+
+    except ValueError as e:
+        return make_response(status='error', msg=str(e))
+    except Exception as e:
+        logger.error(f"Error accessing thumbnail: {str(e)}")
+        return make_response(status='error', msg=str(e))
+
+def _sprite_dir(project_name: str, chapter_name: str) -> str:
+    """章节精灵图的缓存目录，放在 cache 下而不是章节目录中，避免被当作span。"""
+    server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_root = config.get('cache_path') or os.path.join(os.path.dirname(server_root), 'cache')
+    return os.path.join(cache_root, 'sprites', project_name, chapter_name)
+
+@router.get('/chapter_sprite_map')
+async def get_chapter_sprite_map(project_name: str, chapter_name: str, tile: int = 160):
+    """获取章节所有span缩略图拼成的精灵图偏移表。
+
+    返回的 key 由章节内所有图片的修改时间和大小计算，图库据此通过 /media/chapter_sprite
+    加载全部缩略图（图片较多时分为多张，spans 中记录所在的 sheet），并按偏移用 CSS 裁剪显示。
+    """
+    try:
+        chapter_dir = os.path.join(config['projects_path'], project_name, chapter_name)
+        if not os.path.isdir(chapter_dir):
+            return make_response(status='error', msg='章节不存在')
+        sprite_map = await asyncio.to_thread(
+            build_sprite_sheet, chapter_dir, _sprite_dir(project_name, chapter_name), tile
+        )
+        return make_response(data=sprite_map)
+
+    except Exception as e:
+        logger.error(f"Error building sprite sheet: {str(e)}")
+        return make_response(status='error', msg=str(e))
+
+@router.get('/chapter_sprite')
+async def get_chapter_sprite(request: Request, project_name: str, chapter_name: str, key: str, sheet: int = 0):
+    """按 key 获取章节的第 sheet 张精灵图，内容由 key 唯一确定，可长期缓存。"""
+    try:
+        if not key.isalnum():
+            return make_response(status='error', msg='无效的key')
+        sheet_path = sprite_sheet_path(_sprite_dir(project_name, chapter_name), key, sheet)
+        if not os.path.exists(sheet_path):
+            return make_response(status='error', msg='精灵图不存在或已过期')
+
+        etag = f'"{key}-{int(sheet)}"'
+        headers = {'ETag': etag, 'Cache-Control': 'public, max-age=31536000, immutable'}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(sheet_path, media_type='image/webp', headers=headers)
+
+    except Exception as e:
+        logger.error(f"Error accessing sprite sheet: {str(e)}")
+        return make_response(status='error', msg=str(e))
+
 @router.get('/get_audio')
 async def get_media_audio(project_name: str, chapter_name: str, span_id: str):
     """获取指定项目章节span的音频。"""
@@ -87,7 +87,8 @@ async def get_project_info(project_name: str):
                     spans = []
                     for span_dir in sorted(os.listdir(chapter_path)):
                         span_path = os.path.join(chapter_path, span_dir)
-                        if os.path.isdir(span_path):
+                        # 跳过隐藏目录（如旧版本在章节下生成的 .sprites）
+                        if os.path.isdir(span_path) and not span_dir.startswith('.'):
                             # 获取span信息
                             span_info = {
                                 'id': span_dir,
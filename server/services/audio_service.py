@@ -1,18 +1,65 @@
 import os
+import re
+import uuid
+import bisect
 import asyncio
-from typing import Dict, List
+import time
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
 import signal
-import edge_tts
 import traceback
 from .base_service import SingletonService
+from .tts_scheduler import TTSScheduler
+from .tts_backends import TICKS_PER_SECOND, create_tts_backend
+from server.utils.media_cache import MediaCache
+from server.utils.job_store import JobStore
+from server.utils import mp3_utils
 import logging
 
 logger = logging.getLogger(__name__)
 
+AUDIO_WRITE_BUFFER = 256 * 1024  # 流式写入音频时的缓冲区大小
+PACK_SEPARATOR = '\n'  # 合并合成时span之间的分隔符
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?；;…\n])')  # 在句末标点之后切分
+CHUNK_LEAD_PADDING = 0.05  # 长span分块拼接时每块首词前保留的静音（秒）
+CHUNK_TAIL_PADDING = 0.25  # 每块末词后保留的静音，近似自然的句间停顿
+TEXT_HASH_FILENAME = 'audio.hash'  # 与 audio.mp3 同目录，记录生成该音频的文本/语音/语速哈希
+PERSIST_INTERVAL = 1.0  # 任务记录的最短持久化间隔（秒），结束时总会写入
+AUDIO_JOB_TTL = 7 * 24 * 3600  # 任务记录保留时间（秒），超过后不再能恢复
+SPAN_PENDING, SPAN_DONE, SPAN_FAILED = 'pending', 'done', 'failed'
+
 class AudioService(SingletonService):
     def _initialize(self):
         self.tasks: Dict[str, Dict] = {}  # 存储正在进行的任务
+        # 所有任务共享的 TTS 调度器，限制同时进行的 TTS 请求数
+        tts_config = self.config.get('tts') or {}
+        self.backend = create_tts_backend(tts_config)
+        self.scheduler = TTSScheduler(
+            max_concurrency=tts_config.get('max_concurrency', 8),
+            min_concurrency=tts_config.get('min_concurrency', 1),
+            initial_concurrency=tts_config.get('initial_concurrency', 4),
+            latency_target=tts_config.get('latency_target', 10.0),
+            max_retries=tts_config.get('max_retries', 3)
+        )
+        # 合成结果缓存（按规范化文本、语音和语速寻址）
+        server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        cache_root = self.config.get('cache_path') or os.path.join(os.path.dirname(server_root), 'cache')
+        self.use_cache = tts_config.get('use_cache', True)
+        self.audio_cache = MediaCache(
+            os.path.join(cache_root, 'audio'), '.mp3',
+            max_bytes=int(tts_config.get('cache_max_size_mb', 1024) * 1024 * 1024),
+            ttl=tts_config.get('cache_ttl', 30 * 24 * 3600)
+        )
+        # 任务记录，服务重启后可恢复未完成的任务
+        self.job_store = JobStore(os.path.join(cache_root, 'jobs', 'audio'))
+        # 短span合并合成：字数不超过 short_span_chars 的相邻span合并为一次请求
+        self.pack_short_spans = tts_config.get('pack_short_spans', True)
+        self.short_span_chars = tts_config.get('short_span_chars', 30)
+        self.pack_max_chars = tts_config.get('pack_max_chars', 300)
+        self.pack_max_spans = tts_config.get('pack_max_spans', 8)
+        # 长span分块合成：超过 long_span_chars 的span按句子切成约 chunk_chars 的块并发合成
+        self.long_span_chars = tts_config.get('long_span_chars', 200)
+        self.chunk_chars = tts_config.get('chunk_chars', 100)
         # 禁用代理
         os.environ['no_proxy'] = '*'
         # 设置信号处理
@@ -22,32 +69,110 @@ class AudioService(SingletonService):
     def _signal_handler(self, signum, frame):
         """处理中断信号"""
         print("\n正在清理音频生成任务...")
-        # 标记所有任务为取消状态
-        for task_id in self.tasks:
-            self.tasks[task_id]['cancelled'] = True
+        # 标记所有任务为取消状态，并保存进度以便之后恢复
+        for task_id, task in self.tasks.items():
+            task['cancelled'] = True
+            if task['status'] in ('running', 'cancelling'):
+                task['status'] = 'interrupted'
+                self._persist(task_id, force=True)
         print("音频生成任务已取消")
 
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """规范化待合成文本：去掉首尾空白并合并连续空白，不影响发音的差异不会导致缓存失效。"""
+        return ' '.join(text.split())
+
+    def _audio_cache_key(self, text: str, voice: str, rate: str) -> str:
+        return MediaCache.make_key('tts', self.normalize_text(text), voice, rate)
+
+    @staticmethod
+    def _is_up_to_date(output_dir: str, text_hash: str) -> bool:
+        """span目录中的音频是否由同样的文本、语音和语速生成。"""
+        try:
+            with open(os.path.join(output_dir, TEXT_HASH_FILENAME), 'r', encoding='utf-8') as f:
+                recorded = f.read().strip()
+        except OSError:
+            return False
+        return recorded == text_hash and os.path.isfile(os.path.join(output_dir, 'audio.mp3'))
+
+    @staticmethod
+    def _write_text_hash(output_dir: str, text_hash: str) -> None:
+        path = os.path.join(output_dir, TEXT_HASH_FILENAME)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text_hash)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove_audio(output_dir: str) -> None:
+        for filename in ('audio.mp3', TEXT_HASH_FILENAME):
+            path = os.path.join(output_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _persist(self, task_id: str, force: bool = False) -> None:
+        """保存任务记录，非强制时按 PERSIST_INTERVAL 限频。"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return
+        now = time.monotonic()
+        if not force and now - task['persisted_at'] < PERSIST_INTERVAL:
+            return
+        task['persisted_at'] = now
+        try:
+            self.job_store.save(task_id, {
+                'task_id': task_id,
+                'status': task['status'],
+                'created': task['created'],
+                'voice': task['voice'],
+                'rate': task['rate'],
+                'errors': task['errors'][-20:],
+                'spans': [
+                    {'text': text, 'output_dir': output_dir, 'state': span['state'], 'error': span['error']}
+                    for text, output_dir, span in zip(task['prompts'], task['output_dirs'], task['spans'])
+                ]
+            })
+        except Exception as e:
+            logger.warning(f"保存音频任务记录失败 {task_id}: {str(e)}")
  
 
     async def generate_audio(self, prompts: List[str], output_dirs: List[str],
                            voice: str = "zh-CN-XiaoxiaoNeural",
-                           rate: str = "+0%") -> Dict:
-        """生成音频文件"""
+                           rate: str = "+0%", task_id: Optional[str] = None) -> Dict:
+        """生成音频文件
+
+        已有音频且文本哈希一致的span会直接跳过；传入已有的 task_id 时沿用该任务记录（用于恢复）。
+        """
         if len(prompts) != len(output_dirs):
             raise ValueError("prompts和output_dirs的长度必须相同")
             
         logger.info(f"使用语音：{voice}")
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        task_id = f'audio_{timestamp}'
+        if task_id is None:
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            task_id = f'audio_{timestamp}_{uuid.uuid4().hex[:8]}'
         
         # 初始化任务信息
         self.tasks[task_id] = {
+            'prompts': prompts,
+            'output_dirs': output_dirs,
+            'voice': voice,
+            'rate': rate,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'spans': [{'state': SPAN_PENDING, 'error': None} for _ in prompts],
+            'persisted_at': 0.0,
+            'skipped': 0,
             'total': len(prompts),
             'completed': 0,
             'errors': [],
+            'retries': 0,
+            'cached': 0,
+            'packed_requests': 0,
+            'chunked_spans': 0,
             'cancelled': False,
             'status': 'running'
         }
+        self.job_store.prune(AUDIO_JOB_TTL, keep=list(self.tasks))
+        self._persist(task_id, force=True)
         
         # 创建异步任务
         asyncio.create_task(self._process_audio_batch(
@@ -64,80 +189,310 @@ class AudioService(SingletonService):
                                  output_dirs: List[str], voice: str, rate: str):
         """处理音频批量生成任务"""
         task = self.tasks[task_id]
+        spans = task['spans']
         
-        async def generate_single_audio(i: int, text: str, output_dir: str) -> bool:
+        def on_retry(attempt: int, error: Exception):
+            task['retries'] += 1
+
+        def is_cancelled() -> bool:
+            return task['cancelled']
+
+        def record_error(i: int, error: Exception):
+            error_msg = f"Error generating audio at index {i}: {str(error)}"
+            print(error_msg)
+            traceback.print_exc()
+            task['errors'].append(error_msg)
+            spans[i] = {'state': SPAN_FAILED, 'error': str(error)}
+            self._remove_audio(output_dirs[i])
+            self._persist(task_id)
+
+        def mark_done(i: int, output_path: str):
+            spans[i] = {'state': SPAN_DONE, 'error': None}
+            text_hash = self._audio_cache_key(prompts[i], voice, rate)
+            self._write_text_hash(output_dirs[i], text_hash)
+            if not task['cancelled']:
+                task['completed'] += 1
+                if self.use_cache:
+                    self.audio_cache.put(text_hash, output_path)
+            self._persist(task_id)
+
+        async def generate_single_audio(i: int) -> None:
             """生成单个音频文件"""
             if task['cancelled']:
-                return False
+                return
                 
+            text, output_dir = prompts[i], output_dirs[i]
             output_path = os.path.join(output_dir, 'audio.mp3')
+
+            async def synthesize() -> bool:
+                # 每次尝试都写入新的临时文件，完成后原子替换，读者不会看到半个文件
+                part_path = f"{output_path}.{uuid.uuid4().hex}.part"
+                try:
+                    with open(part_path, 'wb', buffering=AUDIO_WRITE_BUFFER) as f:
+                        async for chunk in self.backend.stream(text, voice, rate):
+                            if task['cancelled']:
+                                return False
+                            if chunk["type"] == "audio":
+                                f.write(chunk["data"])
+                    os.replace(part_path, output_path)
+                    return True
+                finally:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
             
             try:
                 os.makedirs(output_dir, exist_ok=True)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                
-                communicate = edge_tts.Communicate(text, voice, rate=rate)
-                async for chunk in communicate.stream():
-                    if task['cancelled']:
-                        if os.path.exists(output_path):
-                            os.remove(output_path)
-                        return False
-                        
-                    if chunk["type"] == "audio":
-                        with open(output_path, "ab") as f:
-                            f.write(chunk["data"])
-                
-                if not task['cancelled']:
-                    task['completed'] += 1
-                return True
-                    
+                if await self.scheduler.run(synthesize, is_cancelled=is_cancelled, on_retry=on_retry):
+                    mark_done(i, output_path)
+            except Exception as e:
+                record_error(i, e)
+
+        async def generate_packed_audio(group: List[int]) -> None:
+            """将一组短span合并为一次TTS请求，再按词边界切回各自的音频"""
+            if task['cancelled']:
+                return
+            texts = [prompts[i] for i in group]
+
+            def synthesize():
+                return self._synthesize_with_boundaries(PACK_SEPARATOR.join(texts), voice, rate, is_cancelled)
+
+            pieces = None
+            try:
+                packed = await self.scheduler.run(synthesize, is_cancelled=is_cancelled, on_retry=on_retry)
+                if packed is None:
+                    return
+                pieces = self._split_packed_audio(texts, *packed)
             except Exception as e:
-                error_msg = f"Error generating audio at index {i}: {str(e)}"
-                print(error_msg)
-                traceback.print_exc()
-                task['errors'].append(error_msg)
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                return False
+                logger.warning(f"短span合并合成失败: {str(e)}")
+
+            if pieces is None:
+                # 无法按词边界对齐时逐条合成
+                logger.info(f"改为逐条合成 {len(group)} 个span")
+                await asyncio.gather(*(generate_single_audio(i) for i in group))
+                return
+
+            task['packed_requests'] += 1
+            for i, piece in zip(group, pieces):
+                output_path = os.path.join(output_dirs[i], 'audio.mp3')
+                try:
+                    os.makedirs(output_dirs[i], exist_ok=True)
+                    self._save_audio(output_path, piece)
+                    mark_done(i, output_path)
+                except Exception as e:
+                    record_error(i, e)
         
+        async def generate_chunked_audio(i: int) -> None:
+            """长span按句子切块并发合成，再按帧无损拼接"""
+            if task['cancelled']:
+                return
+            chunks = self._split_long_text(prompts[i])
+            if len(chunks) < 2:
+                await generate_single_audio(i)
+                return
+
+            def synthesize(text: str):
+                return lambda: self._synthesize_with_boundaries(text, voice, rate, is_cancelled)
+
+            output_path = os.path.join(output_dirs[i], 'audio.mp3')
+            try:
+                parts = await asyncio.gather(
+                    *(self.scheduler.run(synthesize(text), is_cancelled=is_cancelled, on_retry=on_retry)
+                      for text in chunks),
+                    return_exceptions=True
+                )
+                for part in parts:
+                    if isinstance(part, BaseException):
+                        raise part
+                if task['cancelled'] or any(part is None for part in parts):
+                    return
+                audio = mp3_utils.concat([self._trim_to_speech(*part) for part in parts])
+                if not audio:
+                    raise ValueError('no audio frames after concatenation')
+                os.makedirs(output_dirs[i], exist_ok=True)
+                self._save_audio(output_path, audio)
+                task['chunked_spans'] += 1
+                mark_done(i, output_path)
+            except Exception as e:
+                record_error(i, e)
+
+        def generate_group(group: List[int]):
+            if len(group) > 1:
+                return generate_packed_audio(group)
+            if len(self.normalize_text(prompts[group[0]])) > self.long_span_chars:
+                return generate_chunked_audio(group[0])
+            return generate_single_audio(group[0])
+
         try:
-            # 并行生成所有音频
-            tasks = [
-                generate_single_audio(i, text, output_dir)
-                for i, (text, output_dir) in enumerate(zip(prompts, output_dirs))
-            ]
+            # 跳过已是最新的条目，再用缓存放置未变化的条目
+            pending = []
+            for i, (text, output_dir) in enumerate(zip(prompts, output_dirs)):
+                output_path = os.path.join(output_dir, 'audio.mp3')
+                text_hash = self._audio_cache_key(text, voice, rate)
+                if self._is_up_to_date(output_dir, text_hash):
+                    spans[i] = {'state': SPAN_DONE, 'error': None}
+                    task['completed'] += 1
+                    task['skipped'] += 1
+                elif self.use_cache and self.audio_cache.materialize(text_hash, output_path):
+                    self._write_text_hash(output_dir, text_hash)
+                    spans[i] = {'state': SPAN_DONE, 'error': None}
+                    task['completed'] += 1
+                    task['cached'] += 1
+                else:
+                    pending.append(i)
+            self._persist(task_id, force=True)
+
+            # 所有条目一起提交，实际并发由调度器控制
+            tasks = [generate_group(group) for group in self._pack_groups(pending, prompts)]
             await asyncio.gather(*tasks)
                 
             # 更新最终状态
             if task['cancelled']:
-                task['status'] = 'cancelled'
-                # 清理未完成的文件
-                for output_dir in output_dirs[task['completed']:]:
-                    output_path = os.path.join(output_dir, 'audio.mp3')
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
+                if task['status'] != 'interrupted':
+                    task['status'] = 'cancelled'
+                # 清理未完成的文件（条目完成顺序不固定，按各自的结果判断）
+                for output_dir, span in zip(output_dirs, spans):
+                    if span['state'] != SPAN_DONE:
+                        self._remove_audio(output_dir)
             elif task['errors']:
                 task['status'] = 'error'
             else:
                 task['status'] = 'completed'
+            self._persist(task_id, force=True)
         except asyncio.CancelledError:
             task['cancelled'] = True
-            task['status'] = 'cancelled'
-            # 清理所有文件
-            for output_dir in output_dirs:
-                output_path = os.path.join(output_dir, 'audio.mp3')
-                if os.path.exists(output_path):
-                    os.remove(output_path)
+            task['status'] = 'interrupted'
+            # 已完成的span保留，恢复任务时会跳过
+            self._persist(task_id, force=True)
+
+    async def _synthesize_with_boundaries(self, text: str, voice: str, rate: str,
+                                          is_cancelled: Callable[[], bool]) -> Optional[tuple]:
+        """合成到内存，返回 (音频数据, WordBoundary 列表)，被取消时返回 None。"""
+        audio = bytearray()
+        boundaries = []
+        async for chunk in self.backend.stream(text, voice, rate, word_boundary=True):
+            if is_cancelled():
+                return None
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                boundaries.append(chunk)
+        return bytes(audio), boundaries
+
+    def _split_long_text(self, text: str) -> List[str]:
+        """在句子边界处把长文本切成若干块，每块不超过 chunk_chars（单句超长时整句成块）。"""
+        sentences = [s for s in SENTENCE_END_PATTERN.split(text) if s.strip()]
+        chunks = []
+        current = ''
+        for sentence in sentences:
+            if current and len(current) + len(sentence) > self.chunk_chars:
+                chunks.append(current)
+                current = ''
+            current += sentence
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _trim_to_speech(audio: bytes, boundaries: List[Dict]) -> bytes:
+        """按首尾词边界去掉每块前后多余的静音，保留少量停顿作为句间间隔。"""
+        if not boundaries:
+            return mp3_utils.trim(audio)
+        start = boundaries[0]['offset'] / TICKS_PER_SECOND - CHUNK_LEAD_PADDING
+        end = (boundaries[-1]['offset'] + boundaries[-1]['duration']) / TICKS_PER_SECOND + CHUNK_TAIL_PADDING
+        return mp3_utils.trim(audio, max(0.0, start), end)
+
+    def _pack_groups(self, indices: List[int], prompts: List[str]) -> List[List[int]]:
+        """将相邻的短span按字数和数量上限分组，长span单独成组。"""
+        groups = []
+        current: List[int] = []
+        chars = 0
+        for i in indices:
+            length = len(self.normalize_text(prompts[i]))
+            if not self.pack_short_spans or length == 0 or length > self.short_span_chars:
+                if current:
+                    groups.append(current)
+                    current, chars = [], 0
+                groups.append([i])
+                continue
+            if current and (chars + length > self.pack_max_chars or len(current) >= self.pack_max_spans):
+                groups.append(current)
+                current, chars = [], 0
+            current.append(i)
+            chars += length
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _split_packed_audio(texts: List[str], audio: bytes, boundaries: List[Dict]) -> Optional[List[bytes]]:
+        """根据 WordBoundary 把合并合成的音频切回每个span，无法对齐时返回 None。
+
+        每个词的文本在合并文本中按顺序定位，从而确定它属于哪个span；
+        相邻两个span的切点取前一个span最后一个词的结束与后一个span第一个词的开始的中点。
+        """
+        joined = PACK_SEPARATOR.join(texts)
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + len(PACK_SEPARATOR)
+
+        first = [None] * len(texts)  # 每个span第一个词的开始时间
+        last = [None] * len(texts)  # 每个span最后一个词的结束时间
+        cursor = 0
+        for boundary in boundaries:
+            word = boundary.get('text') or ''
+            index = joined.find(word, cursor) if word else -1
+            if index < 0:
+                continue
+            cursor = index + len(word)
+            span = bisect.bisect_right(starts, index) - 1
+            if index >= starts[span] + len(texts[span]):
+                continue  # 落在分隔符上
+            begin = boundary['offset'] / TICKS_PER_SECOND
+            end = (boundary['offset'] + boundary['duration']) / TICKS_PER_SECOND
+            if first[span] is None:
+                first[span] = begin
+            last[span] = end
+
+        if any(t is None for t in first):
+            return None
+        cut_times = [(last[k] + first[k + 1]) / 2 for k in range(len(texts) - 1)]
+        pieces = mp3_utils.split_at_times(audio, cut_times)
+        if any(not piece for piece in pieces):
+            return None
+        return pieces
+
+    @staticmethod
+    def _save_audio(output_path: str, data: bytes) -> None:
+        """原子地写入音频文件"""
+        part_path = f"{output_path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(part_path, 'wb') as f:
+                f.write(data)
+            os.replace(part_path, output_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
 
     def get_generation_progress(self, task_id: str) -> Dict:
         """获取生成任务的进度"""
         if task_id not in self.tasks:
+            job = self.job_store.load(task_id)
+            if job is None:
+                return {
+                    'status': 'not_found',
+                    'current': 0,
+                    'total': 0,
+                    'errors': []
+                }
+            # 服务重启前的任务，只有持久化的记录
+            summary = self._summarize_job(job)
             return {
-                'status': 'not_found',
-                'current': 0,
-                'total': 0,
-                'errors': []
+                'status': summary['status'],
+                'current': summary['done'],
+                'total': summary['total'],
+                'errors': job.get('errors', [])
             }
             
         task = self.tasks[task_id]
@@ -145,7 +500,13 @@ class AudioService(SingletonService):
             'status': task['status'],
             'current': task['completed'],
             'total': task['total'],
-            'errors': task['errors']
+            'errors': task['errors'],
+            'retries': task['retries'],
+            'skipped': task['skipped'],
+            'cached': task['cached'],
+            'packed_requests': task['packed_requests'],
+            'chunked_spans': task['chunked_spans'],
+            'concurrency': self.scheduler.limiter.stats()
         }
         
     def cancel_generation(self, task_id: str) -> bool:
@@ -158,4 +519,49 @@ class AudioService(SingletonService):
         
         if task['status'] == 'running':
             task['status'] = 'cancelling'
+        self._persist(task_id, force=True)
         return True
+
+    def _summarize_job(self, job: Dict) -> Dict:
+        """任务记录摘要；记录为运行中但当前进程里没有该任务的，视为被中断。"""
+        states = [span.get('state') for span in job.get('spans', [])]
+        status = job.get('status')
+        if status in ('running', 'cancelling') and job.get('task_id') not in self.tasks:
+            status = 'interrupted'
+        return {
+            'task_id': job.get('task_id'),
+            'status': status,
+            'created': job.get('created'),
+            'voice': job.get('voice'),
+            'rate': job.get('rate'),
+            'total': len(states),
+            'done': states.count(SPAN_DONE),
+            'failed': states.count(SPAN_FAILED),
+            'pending': states.count(SPAN_PENDING)
+        }
+
+    def list_jobs(self, unfinished_only: bool = True) -> List[Dict]:
+        """列出持久化的音频任务，默认只列出可以恢复的任务。"""
+        jobs = [self._summarize_job(job) for job in self.job_store.list()]
+        if unfinished_only:
+            jobs = [job for job in jobs if job['status'] != 'completed' and job['task_id'] not in self._running_ids()]
+        return jobs
+
+    def _running_ids(self) -> List[str]:
+        return [task_id for task_id, task in self.tasks.items() if task['status'] in ('running', 'cancelling')]
+
+    async def resume_audio(self, task_id: str) -> Dict:
+        """恢复未完成的任务：已完成且文本哈希一致的span直接跳过，其余重新合成。"""
+        if task_id in self._running_ids():
+            raise ValueError('任务正在运行中')
+        job = self.job_store.load(task_id)
+        if job is None:
+            raise ValueError('任务不存在')
+        spans = job.get('spans', [])
+        return await self.generate_audio(
+            prompts=[span['text'] for span in spans],
+            output_dirs=[span['output_dir'] for span in spans],
+            voice=job['voice'],
+            rate=job['rate'],
+            task_id=task_id
+        )
@@ -1,5 +1,6 @@
 import os
 import json
+import shutil
 from server.config.config import load_config
 from typing import Dict, List
 from .base_service import SingletonService
@@ -61,40 +62,53 @@ class ChapterFileService(SingletonService):
             Exception: 当章节目录不存在时抛出
         """
         try:
-            # 构建章节目录路径
-            chapter_dir = os.path.join(self.projects_path, project_name,  chapter_name)
-            print(f"章节目录: {chapter_dir}")
-            # 如果章节目录不存在，直接返回
-            if not os.path.exists(chapter_dir):
-                raise Exception(f"章节目录不存在: {chapter_dir}")
-            
-            # 清空现有的子文件夹
-            for item in os.listdir(chapter_dir):
-                item_path = os.path.join(chapter_dir, item)
-                if os.path.isdir(item_path) and item.isdigit():  # 只删除数字命名的文件夹
-                    import shutil
-                    shutil.rmtree(item_path)
-            
-            # 为每个片段创建文件
-            for i, span in enumerate(spans_and_prompts):
-                span_dir = os.path.join(chapter_dir, str(i+1))
-                os.makedirs(span_dir, exist_ok=True)
-                
-                # 写入span.txt
-                with open(os.path.join(span_dir, 'span.txt'), 'w', encoding='utf-8') as f:
-                    f.write(span['content'])
-                
-                # 写入prompt.json
-                prompt_data = {
-                    'base_scene':span['base_scene'],
-                    'scene': span['scene'],
-                    'prompt': ''  # 默认为空
-                }
-                with open(os.path.join(span_dir, 'prompt.json'), 'w', encoding='utf-8') as f:
-                    json.dump(prompt_data, f, ensure_ascii=False, indent=2)
-                    
+            self.clear_span_files(project_name, chapter_name)
+            self.write_span_files(project_name, chapter_name, spans_and_prompts)
             logging.info(f"已为章节 {chapter_name} 生成 {len(spans_and_prompts)} 个场景文件")
             
         except Exception as e:
             logging.error(f"生成场景文件时出错: {str(e)}")
             raise e
+
+    def _get_chapter_dir(self, project_name: str, chapter_name: str) -> str:
+        """获取章节目录，不存在时抛出异常"""
+        chapter_dir = os.path.join(self.projects_path, project_name,  chapter_name)
+        if not os.path.exists(chapter_dir):
+            raise Exception(f"章节目录不存在: {chapter_dir}")
+        return chapter_dir
+
+    def clear_span_files(self, project_name: str, chapter_name: str) -> None:
+        """清空章节下现有的片段文件夹（只删除数字命名的文件夹）"""
+        chapter_dir = self._get_chapter_dir(project_name, chapter_name)
+        for item in os.listdir(chapter_dir):
+            item_path = os.path.join(chapter_dir, item)
+            if os.path.isdir(item_path) and item.isdigit():
+                shutil.rmtree(item_path)
+
+    def write_span_files(self, project_name: str, chapter_name: str, spans: List[dict], start_index: int = 1) -> None:
+        """
+        从 start_index 开始依次为片段创建文件夹，写入 span.txt 和 prompt.json
+
+        Args:
+            project_name: 项目名称
+            chapter_name: 章节名称
+            spans: 包含文本片段和场景描述的列表
+            start_index: 第一个片段的文件夹编号
+        """
+        chapter_dir = self._get_chapter_dir(project_name, chapter_name)
+        for i, span in enumerate(spans, start=start_index):
+            span_dir = os.path.join(chapter_dir, str(i))
+            os.makedirs(span_dir, exist_ok=True)
+            
+            # 写入span.txt
+            with open(os.path.join(span_dir, 'span.txt'), 'w', encoding='utf-8') as f:
+                f.write(span['content'])
+            
+            # 写入prompt.json
+            prompt_data = {
+                'base_scene':span['base_scene'],
+                'scene': span['scene'],
+                'prompt': ''  # 默认为空
+            }
+            with open(os.path.join(span_dir, 'prompt.json'), 'w', encoding='utf-8') as f:
+                json.dump(prompt_data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,227 @@
+import json
+import time
+import uuid
+import threading
+import requests
+import websocket
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ComfyUISession:
+    """ComfyUI 客户端会话
+
+    每个会话拥有独立的 client_id 和 WebSocket 连接，消息按 prompt_id 归档，
+    由调度器的工作线程独占使用，不同任务之间不再共享连接状态。
+    """
+
+    def __init__(self, api_url: str, timeout: int = 60):
+        self.api_url = api_url
+        self.ws_url = api_url.replace('http', 'ws')
+        self.timeout = timeout
+        self.client_id = str(uuid.uuid4())
+
+        self._ws = None
+        self._ws_connected = False
+        self._ws_error = None
+        self._cond = threading.Condition()
+        self._prompts: Dict[str, Dict[str, Any]] = {}  # prompt_id -> 执行状态
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and self._ws_connected
+
+    def connect(self) -> None:
+        """连接到 ComfyUI WebSocket，已连接时直接返回。"""
+        if self.connected:
+            return
+        self.close()
+
+        ws_url = f"{self.ws_url}/ws?clientId={self.client_id}"
+
+        def on_message(ws, message):
+            if not isinstance(message, str):
+                return  # 预览图等二进制消息
+            try:
+                self._handle_message(json.loads(message))
+            except Exception as e:
+                logger.warning(f"Error processing WebSocket message: {str(e)}")
+
+        def on_error(ws, error):
+            logger.warning(f"WebSocket error: {error}")
+            with self._cond:
+                self._ws_error = error
+                self._cond.notify_all()
+
+        def on_close(ws, close_status_code, close_msg):
+            with self._cond:
+                self._ws_connected = False
+                self._cond.notify_all()
+
+        def on_open(ws):
+            with self._cond:
+                self._ws_connected = True
+                self._cond.notify_all()
+
+        self._ws_error = None
+        self._ws = websocket.WebSocketApp(
+            ws_url,
+            on_message=on_message,
+            on_error=on_error,
+            on_close=on_close,
+            on_open=on_open
+        )
+
+        # 在新线程中启动 WebSocket
+        ws_thread = threading.Thread(target=self._ws.run_forever, daemon=True)
+        ws_thread.start()
+
+        # 等待连接建立或出错
+        with self._cond:
+            self._cond.wait_for(lambda: self._ws_connected or self._ws_error is not None, timeout=10)
+            if self._ws_error:
+                error = self._ws_error
+                self._ws = None
+                raise Exception(f"Failed to connect to WebSocket: {error}")
+            if not self._ws_connected:
+                self._ws = None
+                raise Exception("WebSocket connection timeout")
+
+    def close(self) -> None:
+        """关闭 WebSocket 连接。"""
+        if self._ws:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._ws = None
+            self._ws_connected = False
+            self._ws_error = None
+            self._cond.notify_all()
+
+    @staticmethod
+    def _new_state() -> Dict[str, Any]:
+        return {
+            'done': False,
+            'error': None,
+            'started': None,  # 开始执行的时间（排队结束）
+            'node': None,  # 正在执行的节点
+            'step': 0,
+            'max_steps': 0,
+            'listener': None
+        }
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        """按 prompt_id 记录执行状态和采样进度。"""
+        if not isinstance(message, dict):
+            return
+        msg_type = message.get('type')
+        data = message.get('data') or {}
+        prompt_id = data.get('prompt_id')
+        if not prompt_id:
+            return
+
+        with self._cond:
+            state = self._prompts.setdefault(prompt_id, self._new_state())
+            if msg_type == 'execution_start':
+                state['started'] = state['started'] or time.time()
+            elif msg_type == 'executing':
+                if data.get('node') is None:
+                    state['done'] = True
+                else:
+                    state['node'] = data.get('node')
+                    state['started'] = state['started'] or time.time()
+            elif msg_type == 'progress':
+                state['step'] = data.get('value', 0)
+                state['max_steps'] = data.get('max', 0)
+                state['node'] = data.get('node') or state['node']
+            elif msg_type == 'execution_error':
+                state['error'] = data.get('exception_message') or 'execution error'
+            elif msg_type == 'execution_interrupted':
+                state['error'] = 'interrupted'
+            self._cond.notify_all()
+            listener = state['listener']
+            snapshot = {k: state[k] for k in ('started', 'node', 'step', 'max_steps', 'done')}
+
+        if listener and msg_type in ('execution_start', 'executing', 'progress'):
+            try:
+                listener(prompt_id, snapshot)
+            except Exception as e:
+                logger.warning(f"Progress listener failed: {str(e)}")
+
+    def send_workflow(self, workflow: Dict[str, Any],
+                      on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> str:
+        """发送工作流到 ComfyUI，返回 prompt_id。
+
+        on_progress 会在收到该 prompt 的 execution_start/executing/progress 消息时被调用。
+        """
+        try:
+            payload = {
+                "prompt": workflow,
+                "client_id": self.client_id
+            }
+            response = requests.post(f"{self.api_url}/prompt", json=payload)
+
+            if response.status_code != 200:
+                raise Exception(f"Failed to send workflow: {response.status_code}")
+
+            prompt_id = response.json().get('prompt_id')
+            if not prompt_id:
+                raise Exception("No prompt_id in response")
+
+            with self._cond:
+                self._prompts.setdefault(prompt_id, self._new_state())['listener'] = on_progress
+            return prompt_id
+
+        except Exception as e:
+            raise Exception(f"Error sending workflow: {str(e)}")
+
+    def wait_for_execution(self, prompt_id: str, timeout: Optional[int] = None) -> Tuple[bool, Optional[Dict]]:
+        """等待执行完成并返回该 prompt 的历史记录。"""
+        timeout = timeout or self.timeout
+        try:
+            with self._cond:
+                finished = self._cond.wait_for(
+                    lambda: self._prompt_finished(prompt_id) or not self._ws_connected,
+                    timeout=timeout
+                )
+                state = self._prompts.get(prompt_id, {})
+                if not finished:
+                    logger.warning(f"等待执行超时: {prompt_id}")
+                    return False, None
+                if state.get('error'):
+                    logger.warning(f"执行失败 {prompt_id}: {state['error']}")
+                    return False, None
+                if not state.get('done'):
+                    logger.warning(f"WebSocket 连接已断开: {prompt_id}")
+                    return False, None
+
+            return self._fetch_history(prompt_id)
+        finally:
+            self.forget(prompt_id)
+
+    def _prompt_finished(self, prompt_id: str) -> bool:
+        state = self._prompts.get(prompt_id, {})
+        return bool(state.get('done') or state.get('error'))
+
+    def _fetch_history(self, prompt_id: str, retries: int = 5) -> Tuple[bool, Optional[Dict]]:
+        """获取历史记录，执行完成消息可能先于历史写入到达，短暂重试。"""
+        for attempt in range(retries):
+            try:
+                response = requests.get(f"{self.api_url}/history/{prompt_id}")
+                if response.status_code == 200:
+                    history = response.json()
+                    if history and prompt_id in history:
+                        return True, history[prompt_id]
+            except Exception as e:
+                logger.warning(f"获取历史记录失败: {str(e)}")
+            time.sleep(0.2 * (attempt + 1))
+        return False, None
+
+    def forget(self, prompt_id: str) -> None:
+        """清理已结束 prompt 的状态。"""
+        with self._cond:
+            self._prompts.pop(prompt_id, None)
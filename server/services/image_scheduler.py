@@ -0,0 +1,73 @@
+import itertools
+import queue
+import threading
+from typing import Callable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {
+    'high': 0,     # 交互式的单张重绘
+    'normal': 10,  # 批量生成
+}
+
+
+class ImageJobScheduler:
+    """有界、带优先级的图片任务调度器
+
+    任务按单个提示词拆分后放入优先级队列，由固定数量的工作线程消费。
+    高优先级的任务会在当前图片完成后立即插队，无需等待整批任务结束。
+    取消由 handler 自行判断（出队时检查任务状态），调度器本身不关心任务语义。
+    每个工作线程通过 session_factory 持有自己的会话对象，线程之间互不共享状态。
+    """
+
+    def __init__(self, handler: Callable[[object, str, int], None],
+                 session_factory: Callable[[], object],
+                 max_workers: int = 1, max_pending: int = 0):
+        self._handler = handler
+        self._session_factory = session_factory
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(0, int(max_pending))  # 0 表示不限制排队数量
+
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, task_id: str, count: int, priority: str = 'normal') -> None:
+        """提交任务，task_id 下的 count 个条目按提交顺序排队。"""
+        if self.max_pending and self._queue.qsize() + count > self.max_pending:
+            raise Exception(f"图片任务队列已满（上限 {self.max_pending}）")
+
+        level = PRIORITIES.get(priority, PRIORITIES['normal'])
+        for index in range(count):
+            self._queue.put((level, next(self._counter), task_id, index))
+        self._ensure_workers()
+
+    def pending(self) -> int:
+        """当前排队中的条目数量。"""
+        return self._queue.qsize()
+
+    def _ensure_workers(self) -> None:
+        """按需启动工作线程，数量不超过 max_workers。"""
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"image-worker-{len(self._workers) + 1}",
+                    daemon=True
+                )
+                self._workers.append(worker)
+                worker.start()
+
+    def _worker_loop(self) -> None:
+        session = self._session_factory()
+        while True:
+            _, _, task_id, index = self._queue.get()
+            try:
+                self._handler(session, task_id, index)
+            except Exception as e:
+                logger.error(f"Image job {task_id}[{index}] failed: {str(e)}")
+            finally:
+                self._queue.task_done()
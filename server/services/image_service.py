@@ -1,130 +1,91 @@
 import json
 import os
+import re
 import time
 import uuid
 import random
 import requests
-import websocket
 import threading
 from typing import Dict, List, Optional, Tuple, Any
 from .base_service import SingletonService
-from queue import Queue
+from .comfyui_client import ComfyUISession
+from .image_scheduler import ImageJobScheduler
+from server.utils.media_cache import MediaCache, link_or_copy
+from server.utils.image_derivatives import generate_derivatives
+from server.utils.workflow_registry import get_workflow_registry
 import logging
 
 logger = logging.getLogger(__name__)
 
+MAX_VARIANTS = 8  # 单次执行允许生成的最大候选图数量
+THROUGHPUT_EMA_ALPHA = 0.3  # 吞吐滑动平均的平滑系数
+MAX_LATENCY_SAMPLES = 50  # 保留的单张耗时样本数
+
 class ImageService(SingletonService):        
     def _initialize(self):
         """初始化图像服务。"""
 
         # 基本配置
         self.comfyui_url = self.config['comfyui']['api_url']
-        self.ws_url = self.comfyui_url.replace('http', 'ws')
-        self.client_id = str(uuid.uuid4())
+        comfyui_config = self.config['comfyui']
+        self.timeout = comfyui_config.get('timeout', 60)
 
+        # 生成结果缓存（按解析后的工作流内容寻址）
+        server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        cache_root = self.config.get('cache_path') or os.path.join(os.path.dirname(server_root), 'cache')
+        self.use_cache = comfyui_config.get('use_cache', True)
+        self.image_cache = MediaCache(
+            os.path.join(cache_root, 'images'), '.png',
+            max_bytes=int(comfyui_config.get('cache_max_size_mb', 2048) * 1024 * 1024),
+            ttl=comfyui_config.get('cache_ttl', 30 * 24 * 3600)
+        )
+
+        # 工作流索引（与 load_config 共享同一份）
+        self.workflow_dir = self.config.get('workflow_path') or os.path.join(server_root, 'workflow')
+        self.workflow_registry = get_workflow_registry(self.workflow_dir)
         
         # 任务管理
         if not hasattr(self, 'tasks'):
             self.tasks = {}  # 用于存储任务状态
         if not hasattr(self, 'stop_flag'):
             self.stop_flag = False
+        self._jobs: Dict[str, Dict[str, Any]] = {}  # 任务的输入与运行时状态，按任务隔离
 
-        
-        # WebSocket相关
-        self._ws = None
-        self._ws_connected = False
-        self._ws_error = None
-        self._ws_messages = []
-        self._ws_queue = Queue()
-        self._ws_lock = threading.Lock()
+        # 调度器：有界工作线程池 + 优先级队列，每个工作线程独占一个 ComfyUI 会话
+        self.scheduler = ImageJobScheduler(
+            handler=self._process_job_item,
+            session_factory=lambda: ComfyUISession(self.comfyui_url, self.timeout),
+            max_workers=comfyui_config.get('max_workers', 1),
+            max_pending=comfyui_config.get('max_pending', 0)
+        )
        
     def generate_seed(self) -> int:
         """生成随机种子。"""
         return random.randint(1, 1000000000)
         
-    def _connect_websocket(self) -> websocket.WebSocketApp:
-        """连接到 ComfyUI WebSocket。"""
-        ws_url = f"{self.ws_url}/ws?clientId={self.client_id}"
-   
-        def on_message(ws, message):
-            try:
-                data = json.loads(message)
-                self._ws_messages.append(data)
-            except Exception as e:
-                print(f"Error processing WebSocket message: {str(e)}")
-                
-        def on_error(ws, error):
-            print(f"WebSocket error: {error}")
-            self._ws_error = error
-            
-        def on_close(ws, close_status_code, close_msg):
-            self._ws_connected = False
-            
-        def on_open(ws):
-            self._ws_connected = True
-            
-        self._ws = websocket.WebSocketApp(
-            ws_url,
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close,
-            on_open=on_open
-        )
-        
-        # 在新线程中启动 WebSocket
-        ws_thread = threading.Thread(target=self._ws.run_forever)
-        ws_thread.daemon = True
-        ws_thread.start()
-        
-        # 等待连接建立或出错
-        start_time = time.time()
-        while not self._ws_connected and not self._ws_error and time.time() - start_time < 10:
-            time.sleep(0.1)
-            
-        if self._ws_error:
-            raise Exception(f"Failed to connect to WebSocket: {self._ws_error}")
-        if not self._ws_connected:
-            raise Exception("WebSocket connection timeout")
-            
-        return self._ws
-        
     def _load_workflow(self, workflow_name: Optional[str]) -> Optional[Dict[str, Any]]:
-        """加载工作流配置。"""
+        """加载工作流配置（返回可修改的副本）。"""
         if workflow_name is None:
             workflow_name = "default_workflow.json"
             
-        # 获取服务器根目录
-        server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        workflow_path = os.path.join(server_root, "workflow", workflow_name)
-        
-        print(f"Loading workflow from: {workflow_path}")  # 添加调试信息
-        
-        try:
-            if not os.path.exists(workflow_path):
-                # 尝试直接使用workflow_name（可能是完整路径）
-                if os.path.exists(workflow_name):
-                    workflow_path = workflow_name
-                else:
-                    print(f"Workflow file not found at: {workflow_path}")
-                    if not workflow_name.endswith('.json'):
-                        # 尝试添加.json后缀
-                        workflow_path = os.path.join(server_root, "workflow", workflow_name + '.json')
-                        if not os.path.exists(workflow_path):
-                            print(f"Workflow file not found at: {workflow_path}")
-                            return None
-                    else:
-                        return None
-                
-            with open(workflow_path, 'r', encoding='utf-8') as f:
-                workflow_data = json.load(f)
-                # 确保工作流数据格式正确
-                if not isinstance(workflow_data, dict):
-                    print(f"Invalid workflow format in {workflow_name}")
-                    return None
-                return workflow_data
-        except Exception as e:
-            print(f"Error loading workflow: {str(e)}")
+        workflow_data = self.workflow_registry.load(workflow_name)
+        if workflow_data is not None:
+            return workflow_data
+            
+        # 尝试直接使用workflow_name（可能是完整路径）
+        if os.path.isfile(workflow_name):
+            try:
+                with open(workflow_name, 'r', encoding='utf-8') as f:
+                    workflow_data = json.load(f)
+                if isinstance(workflow_data, dict):
+                    return workflow_data
+                print(f"Invalid workflow format in {workflow_name}")
+            except Exception as e:
+                print(f"Error loading workflow: {str(e)}")
             return None
+            
+        print(f"Workflow file not found: {workflow_name}")
+        return None
         
     def _update_workflow_prompt(self, workflow: Dict[str, Any], prompt: str,style='anime') -> Dict[str, Any]:
         """更新工作流中的提示词。"""
@@ -170,64 +131,110 @@ class ImageService(SingletonService):
                     inputs['width'] = params['width']
                 if 'height' in params:
                     inputs['height'] = params['height']
+                if 'variants' in params:
+                    inputs['batch_size'] = self._get_variant_count(params)
                     
         return workflow
+
+    def _get_variant_count(self, params: Optional[Dict[str, Any]]) -> int:
+        """获取每个提示词需要生成的候选图数量。"""
+        try:
+            variants = int((params or {}).get('variants', 1))
+        except (TypeError, ValueError):
+            variants = 1
+        return max(1, min(variants, MAX_VARIANTS))
+
+    def _variant_cache_key(self, cache_key: str, index: int) -> str:
+        """获取第 index 张候选图的缓存 key。"""
+        return self.image_cache.make_key(cache_key, index)
+
+    def _download_image(self, image: Dict[str, Any]) -> bytes:
+        """从 ComfyUI 下载生成的图片。"""
+        image_params = {
+            'filename': image['filename'],
+            'subfolder': image.get('subfolder', ''),
+            'type': image.get('type', 'output')
+        }
+        image_response = requests.get(f"{self.comfyui_url}/view", params=image_params)
+        if image_response.status_code != 200:
+            raise Exception(f"Failed to download image: {image_response.status_code}")
+        return image_response.content
+
+    def _save_outputs(self, images: List[Dict[str, Any]], output_dir: str,
+                      cache_key: Optional[str], params: Dict[str, Any]) -> None:
+        """保存一次执行产出的图片，多候选时保存为 image_1.png ... image_N.png。"""
+        variants = self._get_variant_count(params)
+        if variants <= 1:
+            output_path = os.path.join(output_dir, "image.png")
+            self._remove_stale_variants(output_dir, 0)
+            self._save_image(output_path, self._download_image(images[0]))
+            print(f"Saved generated image to {output_path}")
+            if cache_key:
+                self.image_cache.put(cache_key, output_path)
+            return
+
+        self._remove_stale_variants(output_dir, variants)
+        for index, image in enumerate(images[:variants], 1):
+            variant_path = os.path.join(output_dir, f"image_{index}.png")
+            self._save_image(variant_path, self._download_image(image))
+            print(f"Saved generated image to {variant_path}")
+            if cache_key:
+                self.image_cache.put(self._variant_cache_key(cache_key, index), variant_path)
+        self.select_variant(output_dir, params.get('primary', 1))
+
+    def _materialize_cached(self, cache_key: str, output_dir: str, params: Dict[str, Any]) -> bool:
+        """尝试从缓存中恢复一次执行的全部产出。"""
+        variants = self._get_variant_count(params)
+        if variants <= 1:
+            if not self.image_cache.get(cache_key):
+                return False
+            self._remove_stale_variants(output_dir, 0)
+            return self.image_cache.materialize(cache_key, os.path.join(output_dir, "image.png"))
+
+        variant_keys = [self._variant_cache_key(cache_key, index) for index in range(1, variants + 1)]
+        if not all(self.image_cache.get(key) for key in variant_keys):
+            return False
+        self._remove_stale_variants(output_dir, variants)
+        for index, key in enumerate(variant_keys, 1):
+            if not self.image_cache.materialize(key, os.path.join(output_dir, f"image_{index}.png")):
+                return False
+        return self.select_variant(output_dir, params.get('primary', 1))
+
+    def _remove_stale_variants(self, output_dir: str, variants: int) -> None:
+        """删除上一次生成遗留的、超出本次数量的候选图及其衍生图；variants 为 0 时一并删除 variants.json。"""
+        if not os.path.isdir(output_dir):
+            return
+        for filename in os.listdir(output_dir):
+            match = re.fullmatch(r'image_(\d+)(\.png|\.derivatives\.json|_(thumb|preview|w\d+)\.webp)', filename)
+            if match and int(match.group(1)) > variants:
+                os.remove(os.path.join(output_dir, filename))
+        variants_path = os.path.join(output_dir, "variants.json")
+        if variants <= 0 and os.path.exists(variants_path):
+            os.remove(variants_path)
+
+    def select_variant(self, output_dir: str, index: int) -> bool:
+        """将第 index 张候选图设为主图 image.png。"""
+        variant_path = os.path.join(output_dir, f"image_{int(index)}.png")
+        if not os.path.exists(variant_path):
+            return False
+
+        link_or_copy(variant_path, os.path.join(output_dir, "image.png"))
+        variant_count = len([f for f in os.listdir(output_dir) if re.fullmatch(r'image_\d+\.png', f)])
+        with open(os.path.join(output_dir, "variants.json"), 'w', encoding='utf-8') as f:
+            json.dump({'count': variant_count, 'primary': int(index)}, f)
+        return True
         
-    def _send_workflow(self, workflow: Dict[str, Any]) -> str:
-        """发送工作流到 ComfyUI。"""
+    def _save_image(self, output_path: str, content: bytes) -> None:
+        """原子地保存图片，避免覆盖与缓存共享 inode 的旧文件。"""
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
         try:
-            payload = {
-                "prompt": workflow,
-                "client_id": self.client_id
-            }
-            response = requests.post(
-                f"{self.comfyui_url}/prompt",
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Failed to send workflow: {response.status_code}")
-                
-            result = response.json()
-            prompt_id = result.get('prompt_id')
-            if not prompt_id:
-                raise Exception("No prompt_id in response")
-                
-            return prompt_id
-            
-        except Exception as e:
-            raise Exception(f"Error sending workflow: {str(e)}")
-            
-    def _wait_for_execution(self, prompt_id: str, timeout: int = 60) -> Tuple[bool, Optional[Dict]]:
-        """等待图片生成完成。"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            # 检查消息队列
-            for message in self._ws_messages[:]:
-                if not isinstance(message, dict):
-                    continue
-                    
-                if message['type'] == 'executing':
-                    data = message.get('data', {})
-                    if data.get('prompt_id') == prompt_id:
-                        if data.get('node') is None:  # 执行完成
-                            # 等待一秒确保图片已保存
-                            time.sleep(1)
-                            try:
-                                # 获取历史记录
-                                response = requests.get(f"{self.comfyui_url}/history/{prompt_id}")
-                                if response.status_code == 200:
-                                    history = response.json()
-                                    if history and prompt_id in history:
-                                        return True, history[prompt_id]
-                            except Exception as e:
-                                print(f"获取历史记录失败: {str(e)}")
-                            return False, None
-                            
-            time.sleep(0.1)
-            
-        print(f"等待执行超时: {prompt_id}")
-        return False, None
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         
     def _check_history_for_image(self, prompt_id: str) -> Tuple[bool, Optional[str]]:
         """从历史记录中检查图片。"""
@@ -254,6 +261,7 @@ class ImageService(SingletonService):
     def generate_image(self, prompt: str, workflow_name: Optional[str], output_path: str,
                       seed: Optional[int] = None, params: Optional[Dict[str, Any]] = None) -> bool:
         """生成单张图片。"""
+        session = None
         try:
             # 加载工作流
             workflow = self._load_workflow(workflow_name)
@@ -274,34 +282,28 @@ class ImageService(SingletonService):
             params['seed'] = seed
             workflow = self._update_workflow_params(workflow, params)
             
-            # 连接 WebSocket
-            self._connect_websocket()
+            # 使用独立会话，避免与调度器中的任务共享连接
+            session = ComfyUISession(self.comfyui_url, self.timeout)
+            session.connect()
             
             # 发送工作流到 ComfyUI
-            prompt_id = self._send_workflow(workflow)
+            prompt_id = session.send_workflow(workflow)
             
             # 等待执行完成
-            success, history = self._wait_for_execution(prompt_id)
+            success, history = session.wait_for_execution(prompt_id)
             if not success:
                 print(f"Failed to generate image: {history}")
                 return False
                 
             # 下载生成的图片
-            image_url = f"{self.comfyui_url}/view"
-            params = {
-                'filename': history['outputs'][0]['images'][0]['filename'],
-                'subfolder': '',
-                'type': 'output'
-            }
-            image_response = requests.get(image_url, params=params)
-            if image_response.status_code != 200:
-                print(f"Failed to download image: {image_response.status_code}")
+            images = [image for node_output in history.get('outputs', {}).values()
+                      for image in node_output.get('images', [])]
+            if not images:
+                print("No image in execution history")
                 return False
                 
             # 保存图片
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            with open(output_path, 'wb') as f:
-                f.write(image_response.content)
+            self._save_image(output_path, self._download_image(images[0]))
             print(f"Saved generated image to {output_path}")
             return True
             
@@ -310,19 +312,16 @@ class ImageService(SingletonService):
             return False
             
         finally:
-            if self._ws:
-                self._ws.close()
-                self._ws = None
-                self._ws_messages = []
-                self._ws_connected = False
-                self._ws_error = None
+            if session:
+                session.close()
             
     def generate_images(
         self,
         prompts: List[str],
         output_dirs: List[str] = None,
         workflow: Optional[str] = None,
-        params: Optional[Dict[str, Any]] = None
+        params: Optional[Dict[str, Any]] = None,
+        priority: str = 'normal'
     ) -> Dict[str, Any]:
         """批量生成图片。
         
@@ -331,6 +330,7 @@ class ImageService(SingletonService):
             output_dirs: 输出目录列表，长度必须与prompts相同
             workflow: 工作流文件名
             params: 生成参数
+            priority: 调度优先级，'high' 用于交互式的单张重绘，'normal' 用于批量生成
         """
         if not isinstance(prompts, list):
             prompts = [prompts]
@@ -341,134 +341,55 @@ class ImageService(SingletonService):
         if not output_dirs:
             output_dirs = [None] * len(prompts)
             
-        # 生成任务ID
-        task_id = f"img_{time.strftime('%Y%m%d_%H%M%S')}"
+        # 生成任务ID（附加随机后缀，同一秒内提交的任务也不会冲突）
+        task_id = f"img_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         logger.info(f"Starting batch generation with workflow: {workflow}")
-        logger.info(f"Starting batch worker for task {task_id}")
+        logger.info(f"Submitting task {task_id} with priority {priority}")
         
         # 检查工作流是否存在
         workflow_error = None
-        if workflow:
-            server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            workflow_path = os.path.join(server_root, "workflow", workflow)
-            if not os.path.exists(workflow_path):
-                workflow_error = f'Workflow file not found: {workflow}'
+        if workflow and not self.workflow_registry.exists(workflow):
+            workflow_error = f'Workflow file not found: {workflow}'
  
-        
-        # 确保 tasks 字典存在
-        if not hasattr(self, 'tasks'):
-            self.tasks = {}
-            
         self.tasks[task_id] = {
             'status': 'error' if workflow_error else 'running',
             'total': len(prompts),
             'current': 0,
             'errors': [],
             'current_prompt': None,
+            'cached': 0,  # 命中缓存的图片数量
+            'deduplicated': 0,  # 与其他span共用同一次生成结果的数量
+            'priority': priority,
+            'timings': {},  # 各阶段累计耗时（秒）：prepare/submit/execute/save
+            'latencies': [],  # 最近已执行图片的耗时（秒，提交到完成）
             'error': workflow_error,
             'outputs': {}  # 存储每个节点的输出
         }
         
-        if not workflow_error:
-            def generate_worker():
-                try:
-                    for i, (prompt, output_dir) in enumerate(zip(prompts, output_dirs)):
-                        if self.tasks[task_id]['status'] == 'cancelled':
-                            print(f"Task {task_id} was cancelled")
-                            break
-                        self.tasks[task_id]['current'] = i
-                        self.tasks[task_id]['current_prompt'] = prompt
-                        
-                        # 为每个图片生成新的随机种子
-                        current_params = params.copy() if params else {}
-                        current_params['seed'] = self.generate_seed()
-                        
-                        # 加载工作流
-                        workflow_data = self._load_workflow(workflow)
-                        if not workflow_data:
-                            self.tasks[task_id]['errors'].append(f"Failed to load workflow for prompt: {prompt}")
-                            continue
-                            
-                        # 更新工作流参数
-                        workflow_data = self._update_workflow_prompt(workflow_data, prompt,current_params['style'])
-                        workflow_data = self._update_workflow_seed(workflow_data, current_params['seed'])
-                        workflow_data = self._update_workflow_params(workflow_data, current_params)
-                        
-                        # 连接 WebSocket
-                        self._connect_websocket()
-                        
-                        try:
-                            # 发送工作流到 ComfyUI
-                            prompt_id = self._send_workflow(workflow_data)
-                            
-                            # 等待执行完成并获取输出
-                            success, history = self._wait_for_execution(prompt_id)
-                            if not success:
-                                self.tasks[task_id]['errors'].append(f"Failed to generate image for prompt: {prompt}")
-                                continue
-                                
-                            # 处理输出
-                            if history and 'outputs' in history:
-                                for node_id, node_output in history['outputs'].items():
-                                    if 'images' in node_output and node_output['images']:
-                                        image = node_output['images'][0]
-                                        
-                                        # 如果指定了输出目录，保存图片
-                                        if output_dir:
-                                            try:
-                                                # 下载图片
-                                                image_url = f"{self.comfyui_url}/view"
-                                                image_params = {
-                                                    'filename': image['filename'],
-                                                    'subfolder': image.get('subfolder', ''),
-                                                    'type': image.get('type', 'output')
-                                                }
-                                                image_response = requests.get(image_url, params=image_params)
-                                                if image_response.status_code == 200:
-                                                    # 保存图片
-                                                    output_path = os.path.join(output_dir, "image.png")
-                                                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                                                    with open(output_path, 'wb') as f:
-                                                        f.write(image_response.content)
-                                                    print(f"Saved generated image to {output_path}")
-                                                else:
-                                                    raise Exception(f"Failed to download image: {image_response.status_code}")
-                                            except Exception as e:
-                                                self.tasks[task_id]['errors'].append(f"Failed to save image: {str(e)}")
-                                                continue
-                                        
-                                        # 存储输出信息
-                                        self.tasks[task_id]['outputs'][node_id] = {
-                                            'images': node_output['images']
-                                        }
-                                        
-                            self.tasks[task_id]['current'] += 1
-                            
-                        except Exception as e:
-                            self.tasks[task_id]['errors'].append(f"Error processing prompt: {str(e)}")
-                        finally:
-                            if self._ws:
-                                self._ws.close()
-                                self._ws = None
-                                self._ws_messages = []
-                                self._ws_connected = False
-                                self._ws_error = None
-                                
-                    if self.tasks[task_id]['status'] != 'cancelled':
-                        self.tasks[task_id]['status'] = 'completed'
-                        
-                except Exception as e:
-                    self.tasks[task_id]['status'] = 'error'
-                    self.tasks[task_id]['errors'].append(str(e))
-                    
-                finally:
-                    self.tasks[task_id]['current_prompt'] = None
-                    print(f"Task {task_id} completed with status: {self.tasks[task_id]['status']}")
-                    
-            # 在新线程中启动生成任务
-            worker_thread = threading.Thread(target=generate_worker)
-            worker_thread.daemon = True
-            worker_thread.start()
+        if not workflow_error and prompts:
+            # 相同的提示词只生成一次，结果分发到所有需要它的span目录
+            unique_prompts, grouped_dirs = self._group_prompts(prompts, output_dirs, (params or {}).get('dedup', 'exact'))
+            self.tasks[task_id]['deduplicated'] = len(prompts) - len(unique_prompts)
+            self._jobs[task_id] = {
+                'prompts': unique_prompts,
+                'output_dirs': grouped_dirs,
+                'workflow': workflow,
+                'params': params or {},
+                'running': {},  # 已提交到 ComfyUI 的 prompt_id -> 执行进度
+                'items_done': 0,
+                'interval_ema': None,  # 相邻两次完成之间间隔的滑动平均（秒）
+                'last_done': time.time(),
+                'lock': threading.Lock()
+            }
+            try:
+                self.scheduler.submit(task_id, len(unique_prompts), priority)
+            except Exception as e:
+                self._jobs.pop(task_id, None)
+                self.tasks[task_id]['status'] = 'error'
+                self.tasks[task_id]['error'] = str(e)
+                self.tasks[task_id]['errors'].append(str(e))
+        elif not workflow_error:
+            self.tasks[task_id]['status'] = 'completed'
         
         return {
             'task_id': task_id,
@@ -476,6 +397,205 @@ class ImageService(SingletonService):
             'status': self.tasks[task_id]['status'],
             'errors': self.tasks[task_id]['errors']
         }
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """归一化提示词：统一大小写、标点与空白，去掉重复的标签。"""
+        text = prompt.casefold().translate(str.maketrans('，。；：！？、（）', ',.;:!?,()'))
+        text = re.sub(r'\s+', ' ', text)
+        tags = []
+        for tag in re.split(r'[,;]|\.(?!\d)', text):
+            tag = tag.strip()
+            if tag and tag not in tags:
+                tags.append(tag)
+        return ', '.join(tags)
+
+    def _group_prompts(self, prompts: List[str], output_dirs: List[Optional[str]],
+                       mode: Any = 'exact') -> Tuple[List[str], List[List[Optional[str]]]]:
+        """按提示词分组。
+
+        mode 为 'exact' 时只合并完全相同的提示词，'normalize' 时合并归一化后相同的
+        提示词（使用组内第一个原始提示词生成），False/'off' 时不合并。
+        """
+        if mode in (False, None, 'off', 'none'):
+            return list(prompts), [[output_dir] for output_dir in output_dirs]
+
+        groups: Dict[str, int] = {}
+        unique_prompts: List[str] = []
+        grouped_dirs: List[List[Optional[str]]] = []
+        for prompt, output_dir in zip(prompts, output_dirs):
+            key = self.normalize_prompt(prompt) if mode == 'normalize' else prompt.strip()
+            if key in groups:
+                grouped_dirs[groups[key]].append(output_dir)
+                continue
+            groups[key] = len(unique_prompts)
+            unique_prompts.append(prompt)
+            grouped_dirs.append([output_dir])
+        return unique_prompts, grouped_dirs
+
+    def _fan_out(self, source_dir: str, target_dirs: List[Optional[str]]) -> None:
+        """将一个span目录中生成的图片分发到其他span目录。"""
+        filenames = [f for f in os.listdir(source_dir)
+                     if f in ('image.png', 'variants.json') or re.fullmatch(r'image_\d+\.png', f)
+                     or re.fullmatch(r'image(_\d+)?(\.derivatives\.json|_(thumb|preview|w\d+)\.webp)', f)]
+        for target_dir in target_dirs:
+            if not target_dir or target_dir == source_dir:
+                continue
+            os.makedirs(target_dir, exist_ok=True)
+            self._remove_stale_variants(target_dir, 0)
+            for filename in filenames:
+                link_or_copy(os.path.join(source_dir, filename), os.path.join(target_dir, filename))
+
+    def _write_derivatives(self, output_dir: str) -> None:
+        """为主图生成缩略图和预览图，失败不影响生成结果。"""
+        image_path = os.path.join(output_dir, "image.png")
+        if not os.path.exists(image_path):
+            return
+        try:
+            generate_derivatives(image_path)
+        except Exception as e:
+            logger.warning(f"Failed to generate derivatives for {image_path}: {str(e)}")
+
+    def _process_job_item(self, session: ComfyUISession, task_id: str, index: int) -> None:
+        """调度器回调：生成任务中的第 index 个（去重后的）提示词。"""
+        task = self.tasks.get(task_id)
+        job = self._jobs.get(task_id)
+        if not task or not job:
+            return
+        if task['status'] in ('cancelled', 'cancelling'):
+            print(f"Task {task_id} was cancelled, skip prompt {index}")
+            return
+            
+        prompt = job['prompts'][index]
+        output_dirs = job['output_dirs'][index]
+        task['current_prompt'] = prompt
+        try:
+            if self._generate_job_image(session, task_id, job, prompt, output_dirs[0]) and output_dirs[0]:
+                self._write_derivatives(output_dirs[0])
+                self._fan_out(output_dirs[0], output_dirs[1:])
+        except Exception as e:
+            task['errors'].append(f"Error processing prompt: {str(e)}")
+            # 连接可能已损坏，下次使用时重新建立
+            session.close()
+        finally:
+            self._finish_job_item(task_id, len(output_dirs))
+
+    def _generate_job_image(self, session: ComfyUISession, task_id: str, job: Dict[str, Any],
+                            prompt: str, output_dir: Optional[str]) -> bool:
+        """加载并更新工作流，命中缓存时直接复用，否则提交到 ComfyUI 生成。成功时返回 True。"""
+        task = self.tasks[task_id]
+        stage_start = time.perf_counter()
+        
+        # 未固定种子时为每个图片生成新的随机种子
+        current_params = job['params'].copy()
+        if not current_params.get('seed'):
+            current_params['seed'] = self.generate_seed()
+            
+        # 加载工作流
+        workflow_data = self._load_workflow(job['workflow'])
+        if not workflow_data:
+            task['errors'].append(f"Failed to load workflow for prompt: {prompt}")
+            return False
+            
+        # 更新工作流参数
+        workflow_data = self._update_workflow_prompt(workflow_data, prompt, current_params['style'])
+        workflow_data = self._update_workflow_seed(workflow_data, current_params['seed'])
+        workflow_data = self._update_workflow_params(workflow_data, current_params)
+        
+        # 相同的工作流（提示词、种子、尺寸等均已写入）直接复用缓存，不占用 GPU；
+        # 随机种子的结果不会再被命中，只在调用方固定了种子时读写缓存
+        cache_key = None
+        if job['params'].get('seed') and current_params.get('use_cache', self.use_cache):
+            cache_key = self.image_cache.make_key(workflow_data)
+            if output_dir and self._materialize_cached(cache_key, output_dir, current_params):
+                print(f"Image cache hit for prompt: {prompt}")
+                with job['lock']:
+                    task['cached'] += 1
+                self._add_timing(job, task, 'prepare', stage_start)
+                return True
+        stage_start = self._add_timing(job, task, 'prepare', stage_start)
+        
+        # 发送工作流到 ComfyUI 并等待执行完成
+        def on_progress(prompt_id: str, state: Dict[str, Any]) -> None:
+            with job['lock']:
+                if prompt_id in job['running']:
+                    job['running'][prompt_id].update(state)
+
+        session.connect()
+        submitted = time.time()
+        prompt_id = session.send_workflow(workflow_data, on_progress=on_progress)
+        stage_start = self._add_timing(job, task, 'submit', stage_start)
+        with job['lock']:
+            # 会话推送的是累计状态，登记之前到达的消息会被之后的消息覆盖，不会丢失进度
+            job['running'][prompt_id] = {'prompt': prompt, 'submitted': submitted, 'started': None,
+                                         'node': None, 'step': 0, 'max_steps': 0}
+        try:
+            success, history = session.wait_for_execution(prompt_id)
+        finally:
+            with job['lock']:
+                job['running'].pop(prompt_id, None)
+        stage_start = self._add_timing(job, task, 'execute', stage_start)
+        if success:
+            with job['lock']:
+                latencies = task['latencies']
+                latencies.append(round(time.time() - submitted, 3))
+                del latencies[:-MAX_LATENCY_SAMPLES]
+        if not success:
+            task['errors'].append(f"Failed to generate image for prompt: {prompt}")
+            return False
+            
+        # 处理输出
+        saved = False
+        for node_id, node_output in (history or {}).get('outputs', {}).items():
+            if 'images' in node_output and node_output['images']:
+                # 如果指定了输出目录，保存图片
+                if output_dir:
+                    try:
+                        self._save_outputs(node_output['images'], output_dir, cache_key, current_params)
+                        saved = True
+                    except Exception as e:
+                        task['errors'].append(f"Failed to save image: {str(e)}")
+                        continue
+                        
+                # 存储输出信息
+                task['outputs'][node_id] = {
+                    'images': node_output['images']
+                }
+        self._add_timing(job, task, 'save', stage_start)
+        return saved or not output_dir
+
+    def _add_timing(self, job: Dict[str, Any], task: Dict[str, Any], stage: str, start: float) -> float:
+        """累计某个阶段的耗时，返回当前时间作为下一阶段的起点。多个工作线程共用同一任务，在任务锁内更新。"""
+        now = time.perf_counter()
+        with job['lock']:
+            timings = task.setdefault('timings', {})
+            timings[stage] = timings.get(stage, 0.0) + (now - start)
+        return now
+
+    def _finish_job_item(self, task_id: str, count: int = 1) -> None:
+        """更新任务进度（count 为该条目覆盖的span数量），全部处理完后结束任务。"""
+        task = self.tasks[task_id]
+        job = self._jobs.get(task_id)
+        if not job:
+            return
+        with job['lock']:
+            # 用相邻完成间隔的滑动平均估算吞吐，多个工作线程并行时同样适用
+            now = time.time()
+            interval = now - job['last_done']
+            job['last_done'] = now
+            job['items_done'] += 1
+            if job['interval_ema'] is None:
+                job['interval_ema'] = interval
+            else:
+                job['interval_ema'] = THROUGHPUT_EMA_ALPHA * interval + (1 - THROUGHPUT_EMA_ALPHA) * job['interval_ema']
+            task['current'] += count
+            if task['current'] < task['total']:
+                return
+            task['current_prompt'] = None
+            if task['status'] == 'running':
+                task['status'] = 'completed'
+            self._jobs.pop(task_id, None)
+        print(f"Task {task_id} completed with status: {task['status']}")
         
     def get_generation_progress(self, task_id: str) -> Dict[str, Any]:
         """获取生成进度。"""
@@ -488,14 +608,52 @@ class ImageService(SingletonService):
             }
             
         task = self.tasks[task_id]
-        return {
+        latencies = list(task.get('latencies', []))
+        progress = {
             'status': task['status'],
             'current': task['current'],
             'total': task['total'],
             'errors': task.get('errors', []),
-            'current_prompt': task.get('current_prompt')
+            'current_prompt': task.get('current_prompt'),
+            'cached': task.get('cached', 0),
+            'deduplicated': task.get('deduplicated', 0),
+            'timings': dict(task.get('timings', {})),
+            'active': [],
+            'step': 0,
+            'max_steps': 0,
+            'last_latency': latencies[-1] if latencies else None,
+            'avg_latency': sum(latencies) / len(latencies) if latencies else None,
+            'images_per_minute': None,
+            'eta': 0 if task['status'] != 'running' else None
         }
         
+        job = self._jobs.get(task_id)
+        if job and task['status'] == 'running':
+            now = time.time()
+            with job['lock']:
+                active = [dict(item) for item in job['running'].values()]
+                interval = job['interval_ema']
+                remaining = len(job['prompts']) - job['items_done']
+            for item in active:
+                progress['active'].append({
+                    'prompt': item['prompt'],
+                    'node': item['node'],
+                    'step': item['step'],
+                    'max_steps': item['max_steps'],
+                    'queued': item['started'] is None,
+                    'elapsed': round(now - (item['started'] or item['submitted']), 3)
+                })
+            running = [item for item in progress['active'] if not item['queued']]
+            if running:
+                progress['step'] = running[0]['step']
+                progress['max_steps'] = running[0]['max_steps']
+            if interval:
+                progress['images_per_minute'] = round(60 / interval, 2)
+                # 扣除正在执行的图片已完成的比例
+                done_fraction = sum(item['step'] / item['max_steps'] for item in running if item['max_steps'])
+                progress['eta'] = round(max(0.0, (remaining - done_fraction) * interval), 1)
+        return progress
+        
 
     def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """获取任务状态。"""
@@ -508,103 +666,45 @@ class ImageService(SingletonService):
         if task_id not in self.tasks:
             return False
             
-        try:
-            # 先设置任务状态为取消中
-            self.tasks[task_id]['status'] = 'cancelling'
-            
-            # 调用 ComfyUI 的中断接口
-            response = requests.post(f"{self.comfyui_url}/interrupt")
-            if response.status_code == 200:
-                # 更新任务状态为已取消
-                self.tasks[task_id]['status'] = 'cancelled'
-                return True
-            else:
-                print(f"取消任务失败: {response.status_code}")
-                # 如果取消失败，恢复任务状态
-                self.tasks[task_id]['status'] = 'running'
-        except Exception as e:
-            print(f"取消任务失败: {str(e)}")
-            # 如果发生异常，恢复任务状态
-            self.tasks[task_id]['status'] = 'running'
-        return False
+        task = self.tasks[task_id]
+        if task['status'] != 'running':
+            return task['status'] == 'cancelled'
+            
+        # 先设置任务状态为取消中，排队中的条目出队时会被跳过
+        task['status'] = 'cancelling'
+        job = self._jobs.get(task_id)
+        running = []
+        if job:
+            with job['lock']:
+                running = list(job['running'])
+            
+        # 只中断本任务已提交到 ComfyUI 的 prompt，不影响其他任务
+        for prompt_id in running:
+            try:
+                requests.post(f"{self.comfyui_url}/queue", json={'delete': [prompt_id]})
+                response = requests.post(f"{self.comfyui_url}/interrupt", json={'prompt_id': prompt_id})
+                if response.status_code != 200:
+                    print(f"中断任务失败: {response.status_code}")
+            except Exception as e:
+                print(f"中断任务失败: {str(e)}")
+                
+        task['status'] = 'cancelled'
+        task['current_prompt'] = None
+        self._jobs.pop(task_id, None)
+        return True
         
     def list_workflows(self) -> List[Dict[str, Any]]:
         """列出所有可用的工作流。"""
-        workflow_dir = "workflow"
-        workflows = []
-        
         try:
-            for filename in os.listdir(workflow_dir):
-                if filename.endswith('.json'):
-                    workflow_path = os.path.join(workflow_dir, filename)
-                    try:
-                        with open(workflow_path, 'r', encoding='utf-8') as f:
-                            workflow = json.load(f)
-                            # 提取工作流的基本信息
-                            info = {
-                                'name': filename,
-                                'path': workflow_path,
-                                'size': os.path.getsize(workflow_path),
-                                'modified': os.path.getmtime(workflow_path)
-                            }
-                            # 尝试提取更多信息
-                            for node in workflow.values():
-                                if isinstance(node, dict):
-                                    meta = node.get('_meta', {})
-                                    if meta.get('title') == 'KSampler':
-                                        info['sampler'] = node.get('inputs', {}).get('sampler_name')
-                                    elif meta.get('title') == 'EmptyLatentImage':
-                                        inputs = node.get('inputs', {})
-                                        info['width'] = inputs.get('width')
-                                        info['height'] = inputs.get('height')
-                            workflows.append(info)
-                    except Exception as e:
-                        print(f"Error loading workflow {filename}: {str(e)}")
-                        
-            return sorted(workflows, key=lambda x: x['name'])
-            
+            return self.workflow_registry.list_workflows()
         except Exception as e:
             print(f"错误: {str(e)}")
             return []
             
     def get_workflow(self, name: str) -> Optional[Dict[str, Any]]:
         """获取指定工作流的详细信息。"""
-        if not name.endswith('.json'):
-            name += '.json'
-            
-        workflow_path = os.path.join("workflow", name)
-        
         try:
-            if not os.path.exists(workflow_path):
-                return None
-                
-            with open(workflow_path, 'r', encoding='utf-8') as f:
-                workflow = json.load(f)
-                
-            # 添加工作流的元数据
-            metadata = {
-                'name': name,
-                'path': workflow_path,
-                'size': os.path.getsize(workflow_path),
-                'modified': os.path.getmtime(workflow_path),
-                'nodes': {}
-            }
-            
-            # 分析工作流中的节点
-            for node_id, node in workflow.items():
-                if isinstance(node, dict):
-                    node_info = {
-                        'type': node.get('class_type'),
-                        'title': node.get('_meta', {}).get('title'),
-                        'inputs': node.get('inputs', {})
-                    }
-                    metadata['nodes'][node_id] = node_info
-                    
-            return {
-                'metadata': metadata,
-                'workflow': workflow
-            }
-            
+            return self.workflow_registry.get(name)
         except Exception as e:
             print(f"错误 {name}: {str(e)}")
             return None
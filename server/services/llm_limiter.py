@@ -0,0 +1,110 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _TokenBucket:
+    """每分钟 per_minute 个令牌的令牌桶，容量为一分钟的额度；per_minute 为 0 表示不限制"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if self.per_minute:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """令牌足够 amount 还需等待的秒数"""
+        if not self.per_minute:
+            return 0.0
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) * 60 / self.per_minute)
+
+    def take(self, amount: float) -> None:
+        if self.per_minute:
+            self.tokens = min(self.capacity, self.tokens - min(amount, self.capacity))
+
+
+class LLMRateLimiter:
+    """进程级的 LLM 调用限流器
+
+    同时限制每分钟请求数（rpm）、每分钟 token 数（tpm）和同时进行的请求数（max_in_flight），
+    任一项为 0 表示不限制。请求按到达顺序依次获得额度；调用结束后可用实际 token 用量修正估计值。
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_in_flight: int = 0):
+        self.configure(rpm, tpm, max_in_flight)
+        self.in_flight = 0
+        self.total_requests = 0
+        self.total_wait = 0.0
+        self._order = asyncio.Lock()
+        self._slots = asyncio.Condition()
+
+    def configure(self, rpm: int = 0, tpm: int = 0, max_in_flight: int = 0) -> None:
+        """更新限额，已在进行的请求不受影响"""
+        self.rpm = int(rpm or 0)
+        self.tpm = int(tpm or 0)
+        self.max_in_flight = int(max_in_flight or 0)
+        self._requests = _TokenBucket(self.rpm)
+        self._tokens = _TokenBucket(self.tpm)
+
+    @asynccontextmanager
+    async def limit(self, estimated_tokens: int = 0):
+        """获取一次调用的额度；返回的字典中可写入 'actual_tokens' 以修正 token 用量"""
+        start = time.monotonic()
+        async with self._order:
+            async with self._slots:
+                await self._slots.wait_for(lambda: not self.max_in_flight or self.in_flight < self.max_in_flight)
+                self.in_flight += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    delay = max(self._requests.wait_time(1), self._tokens.wait_time(estimated_tokens))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self._requests.take(1)
+                self._tokens.take(estimated_tokens)
+            except BaseException:
+                await self._release()
+                raise
+
+        waited = time.monotonic() - start
+        self.total_requests += 1
+        self.total_wait += waited
+        if waited > 1:
+            logger.info(f"LLM 请求限流等待 {waited:.1f}s")
+
+        ticket: Dict[str, Any] = {'estimated_tokens': estimated_tokens, 'actual_tokens': None}
+        try:
+            yield ticket
+        finally:
+            actual = ticket.get('actual_tokens')
+            if actual is not None:
+                self._tokens.take(actual - estimated_tokens)
+            await self._release()
+
+    async def _release(self) -> None:
+        async with self._slots:
+            self.in_flight -= 1
+            self._slots.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rpm': self.rpm,
+            'tpm': self.tpm,
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self.in_flight,
+            'total_requests': self.total_requests,
+            'avg_wait': self.total_wait / self.total_requests if self.total_requests else 0.0
+        }
@@ -3,7 +3,9 @@ import json
 import logging
 import re
 import asyncio
-from typing import AsyncGenerator, List, Dict
+import random
+import time
+from typing import Any, AsyncGenerator, List, Dict, Optional, Tuple
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain.agents import initialize_agent, AgentType
@@ -12,29 +14,107 @@ from langchain_openai import ChatOpenAI
 from langchain.callbacks import AsyncIteratorCallbackHandler
 
 
+from server.config.config import register_config_listener
 from server.services.base_service import SingletonService
 from server.services.kg_service import KGService
 from server.services.scene_service import SceneService
+from server.services.llm_limiter import LLMRateLimiter
+from server.utils.job_store import JobStore
+from server.utils.json_output import parse_json_output
+from server.utils.llm_cache import LLMResponseCache
+from server.utils.token_counter import count_message_tokens, pack_sentences
 
 logger = logging.getLogger(__name__)
 
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """每次模型调用都先向进程级限流器申请额度的 ChatOpenAI
+
+    限流放在模型调用这一层，Agent 推理循环中的每一步都会单独计入 rpm/tpm，
+    调用结束（包括被取消）时释放额度，并用实际 token 用量修正估计值。
+    """
+
+    limiter: Any = None
+    completion_tokens_estimate: int = 1024
+
+    def _estimate(self, messages: List) -> int:
+        return count_message_tokens(messages) + self.completion_tokens_estimate
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.limiter is None or self.streaming:
+            # streaming 模式下 ChatOpenAI 会转由 _astream 生成，在那里申请额度
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        async with self.limiter.limit(self._estimate(messages)) as ticket:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            usage = (result.llm_output or {}).get('token_usage') or {}
+            if usage.get('total_tokens'):
+                ticket['actual_tokens'] = usage['total_tokens']
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.limiter is None:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        async with self.limiter.limit(self._estimate(messages)) as ticket:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage = getattr(chunk.message, 'usage_metadata', None)
+                if usage and usage.get('total_tokens'):
+                    ticket['actual_tokens'] = usage['total_tokens']
+                yield chunk
+
+
+SPLIT_JOB_TTL = 7 * 24 * 3600  # 未完成的分割任务保留时间（秒）
+
 class LLMService(SingletonService):
     """使用LangChain重构的LLM服务类"""
     
     _prompt_cache: Dict[str, str] = {}
 
     def _initialize(self):
-        self.api_key = self.config['llm']['api_key']
-        self.api_url = self.config['llm']['api_url']
-        self.model_name = self.config['llm']['model_name']
         self.prompts_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompts')
         self.projects_path = self.config.get('projects_path', 'projects/')
         self.kg_service = KGService()
         self.scene_service = SceneService()
 
+        # 响应缓存（可选）：确定性流程中相同输入的调用直接复用结果
+        server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        cache_root = self.config.get('cache_path') or os.path.join(os.path.dirname(server_root), 'cache')
+        cache_config = self.config['llm'].get('cache') or {}
+        self.response_cache = None
+        if cache_config.get('enabled', False):
+            self.response_cache = LLMResponseCache(
+                os.path.join(cache_root, 'llm', 'responses.sqlite3'),
+                ttl=cache_config.get('ttl', 7 * 24 * 3600),
+                max_bytes=int(cache_config.get('max_size_mb', 200) * 1024 * 1024)
+            )
+        
+        # 流式生成统计：cancelled 为客户端断开等原因提前关闭的次数
+        self.stream_stats = {'started': 0, 'completed': 0, 'cancelled': 0, 'failed': 0}
+
+        # 分割任务记录：保存每个文本块的状态和结果，失败后可只重试失败的块
+        self.split_jobs = JobStore(os.path.join(cache_root, 'jobs', 'split'))
+
+        # 进程级限流：所有 LLM 调用共享每分钟请求数/token 数和并发上限
+        self.limiter = LLMRateLimiter()
+        self._configure_limiter()
         
-        # 初始化LangChain LLM
-        self.llm = ChatOpenAI(
+        # 初始化LangChain LLM，Agent执行器按工具集缓存，LLM 配置变化时一并重建
+        self._agents: Dict[tuple, Any] = {}
+        self._llm_fingerprint: Optional[tuple] = None
+        self._build_llm()
+        register_config_listener(self._on_config_update)
+
+    def _current_fingerprint(self) -> tuple:
+        llm_config = self.config['llm']
+        return llm_config['api_key'], llm_config['api_url'], llm_config['model_name']
+
+    def _build_llm(self):
+        """按当前配置创建 LLM，并清空基于旧 LLM 创建的 Agent执行器"""
+        self.api_key, self.api_url, self.model_name = self._current_fingerprint()
+        self.llm = RateLimitedChatOpenAI(
+            limiter=self.limiter,
+            completion_tokens_estimate=self.completion_tokens_estimate,
             api_key=self.api_key,
             base_url=self.api_url,
             model=self.model_name,
@@ -43,15 +123,25 @@ class LLMService(SingletonService):
             max_retries=3,
             streaming=True,
         )
-        
-        self.agent=initialize_agent(
-            tools=[],
-            llm=self.llm,
-            agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
-            handle_parsing_errors=True,
-
-        )
+        self._agents = {}
+        self._llm_fingerprint = (self.api_key, self.api_url, self.model_name)
+        self.agent = self._create_agent_executor()
+
+    def _configure_limiter(self):
+        rate_config = self.config['llm'].get('rate_limit') or {}
+        limits = (rate_config.get('rpm', 0), rate_config.get('tpm', 0), rate_config.get('max_in_flight', 8))
+        if (self.limiter.rpm, self.limiter.tpm, self.limiter.max_in_flight) != limits:
+            self.limiter.configure(*limits)
+        self.completion_tokens_estimate = rate_config.get('completion_tokens', 1024)
+        if getattr(self, 'llm', None) is not None:
+            self.llm.completion_tokens_estimate = self.completion_tokens_estimate
+
+    def _on_config_update(self):
+        """配置更新后同步限流参数；模型、地址或密钥变化时重建 LLM"""
+        self._configure_limiter()
+        if self._current_fingerprint() != self._llm_fingerprint:
+            logger.info("LLM 配置已变化，重建 LLM 和 Agent执行器")
+            self._build_llm()
 
     def _load_prompt(self, prompt_file: str) -> str:
         """加载提示词模板"""
@@ -69,54 +159,232 @@ class LLMService(SingletonService):
         return prompt
 
     def _create_agent_executor(self,tools: List[Tool] = None):
-        """创建Agent执行器"""
-        if tools is None or len(tools) == 0:
-            return self.agent
-        
-        agent=initialize_agent(
-            tools=tools,
-            llm=self.llm,
-            agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=False,#是否打印详细日志
-            handle_parsing_errors=True,
+        """获取Agent执行器，同一工具集只创建一次"""
+        tools = tools or []
+        key = tuple((tool.name, id(tool)) for tool in tools)
+        agent = self._agents.get(key)
+        if agent is None:
+            agent=initialize_agent(
+                tools=tools,
+                llm=self.llm,
+                agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+                verbose=not tools,#是否打印详细日志
+                handle_parsing_errors=True,
+
+            )
+            self._agents[key] = agent
+        return agent
 
+    def _cache_key(self, kind: str, messages: List) -> str:
+        """缓存 key：调用类型、模型、服务地址、采样参数和完整的消息列表"""
+        return LLMResponseCache.make_key(
+            kind,
+            self.model_name,
+            self.api_url,
+            {'temperature': self.llm.temperature},
+            [(message.type, message.content) for message in messages]
         )
-        
-        
-        return agent
+
+    async def _cached_call(self, kind: str, messages: List, call):
+        """带响应缓存的调用，call 的返回值需可 JSON 序列化"""
+        if self.response_cache is None:
+            return await call()
+        key = self._cache_key(kind, messages)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached
+        result = await call()
+        self.response_cache.put(key, result)
+        return result
+
+    async def _call_llm(self, messages: List, json_mode: bool = False) -> str:
+        """调用一次 LLM（不经过缓存），返回文本内容"""
+        llm = self.llm
+        if json_mode and self.config['llm'].get('json_response_format', False):
+            # 服务端支持时要求直接返回 JSON 对象
+            llm = llm.bind(response_format={'type': 'json_object'})
+        response = await llm.ainvoke(messages)
+        return response.content
+
+    async def _invoke_llm(self, messages: List, validate=None, kind: str = 'chat') -> Any:
+        """直接调用 LLM，返回文本内容
+
+        传入 validate 时返回其处理后的结果，不合格时由 validate 抛出 ValueError，
+        校验在缓存的调用内进行，只有校验通过的结果才会写入缓存。
+        """
+        async def call():
+            output = await self._call_llm(messages)
+            return validate(output) if validate else output
+        return await self._cached_call(kind, messages, call)
+
+    async def _invoke_json(self, kind: str, messages: List, validate, max_attempts: Optional[int] = None) -> Any:
+        """直接调用 LLM 并按 validate 校验 JSON 输出
+
+        validate 接收解析后的 JSON，返回规范化的结果，不合格时抛出 ValueError。
+        只有解析或校验失败时才重试：把上一次的输出和错误原因追加到对话中再调用一次，
+        超过 max_attempts 次（默认取 json_max_attempts）仍不合格时抛出 ValueError。缓存的是校验通过的结果。
+        调用方自己有重试循环时应传 max_attempts=1，避免两层重试次数相乘。
+        """
+        if max_attempts is None:
+            max_attempts = self.config['llm'].get('json_max_attempts', 3)
+        max_attempts = max(1, int(max_attempts))
+
+        async def call():
+            conversation = list(messages)
+            for attempt in range(1, max_attempts + 1):
+                output = await self._call_llm(conversation, json_mode=True)
+                try:
+                    return validate(parse_json_output(output))
+                except ValueError as e:
+                    logger.warning(f"LLM 输出校验失败（{kind}，第 {attempt}/{max_attempts} 次）：{e}")
+                    error = e
+                conversation += [
+                    AIMessage(content=output),
+                    HumanMessage(content=f"上面的输出不符合要求：{error}。请重新输出，只输出符合格式要求的 JSON，不要附带其他内容。")
+                ]
+            raise ValueError(f"LLM 输出在 {max_attempts} 次尝试后仍不符合要求：{error}")
+        return await self._cached_call(f'json:{kind}', messages, call)
+
+    @staticmethod
+    def _validate_scenes(data: Any) -> Dict[str, str]:
+        """场景提取结果：{场景名: 英文描述}"""
+        if not isinstance(data, dict):
+            raise ValueError('应为 JSON 对象，键为场景名，值为英文描述')
+        scenes = {}
+        for name, description in data.items():
+            if not isinstance(description, str) or not name.strip():
+                raise ValueError(f'场景 "{name}" 的描述应为非空的场景名和字符串描述')
+            scenes[name.strip()] = description.strip()
+        return scenes
+
+    @staticmethod
+    def _validate_spans(data: Any) -> List[dict]:
+        """文本描述结果：{"spans": [{"content", "base_scene", "scene"}]}"""
+        spans = data.get('spans') if isinstance(data, dict) else None
+        if not isinstance(spans, list):
+            raise ValueError('应为包含 "spans" 数组的 JSON 对象')
+        result = []
+        for index, span in enumerate(spans):
+            if not isinstance(span, dict):
+                raise ValueError(f'spans[{index}] 应为对象')
+            for field in ('content', 'base_scene', 'scene'):
+                if not isinstance(span.get(field), str):
+                    raise ValueError(f'spans[{index}] 缺少字符串字段 "{field}"')
+            if not span['content'].strip():
+                raise ValueError(f'spans[{index}] 的 content 为空')
+            result.append({field: span[field].strip() for field in ('content', 'base_scene', 'scene')})
+        return result
+
+    async def _invoke_agent(self, messages: List, validate=None, kind: str = 'agent') -> dict:
+        """调用不带工具的 Agent，返回 {'output': ...}
+
+        传入 validate 时 output 为其处理后的结果，与 _invoke_llm 一样只缓存校验通过的结果。
+        """
+        agent_executor = self._create_agent_executor()
+
+        async def call():
+            response = await agent_executor.ainvoke(messages)
+            output = response.get('output')
+            return {'output': validate(output) if validate else output}
+        return await self._cached_call(kind, messages, call)
 
     async def _process_text_stream(self, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
-        """处理文本流"""
+        """处理文本流
+
+        生成器被关闭或所在任务被取消时（如客户端断开连接），同时取消上游的 LLM 调用，
+        模型调用结束后才释放限流额度。结果计入 stream_stats。
+        """
         callback = AsyncIteratorCallbackHandler()
+        self.stream_stats['started'] += 1
         # 使用 asyncio.create_task 来运行 LLM 调用，以便 callback.aiter() 可以立即开始迭代
         task = asyncio.create_task(
             self.llm.ainvoke(messages, config={"callbacks": [callback]})
         )
-        async for token in callback.aiter():
-            yield token
-        # 确保LLM调用任务完成
-        await task
+        try:
+            async for token in callback.aiter():
+                yield token
+            # 确保LLM调用任务完成
+            await task
+        except (GeneratorExit, asyncio.CancelledError):
+            self.stream_stats['cancelled'] += 1
+            raise
+        except Exception:
+            self.stream_stats['failed'] += 1
+            raise
+        else:
+            self.stream_stats['completed'] += 1
+        finally:
+            if not task.done():
+                logger.info("文本流已关闭，取消上游 LLM 请求")
+                task.cancel()
+                await asyncio.wait([task])
 
     async def split_text_and_generate_prompts(self, project_name: str, text: str) -> List[dict]:
         """分割文本并生成描述词"""
-        window_size = self.config['llm'].get('window_size', -1)
+        spans = []
+        async for _, _, chunk_spans in self.iter_split_chunks(project_name, text):
+            spans.extend(chunk_spans)
+        return spans
+
+    async def iter_split_chunks(self, project_name: str, text: str) -> AsyncGenerator[Tuple[int, int, List[dict]], None]:
+        """分割文本并生成描述词，按文本顺序逐块产出 (块序号, 块总数, 片段列表)
+
+        各块并行请求；后面的块先完成时会等前面的块产出后再产出。生成器提前关闭时取消未完成的请求。
+        每块的结果和状态记录在分割任务中，失败的块按退避重试；重试后仍有块失败时，等其余块完成并记录后抛出异常，
+        之后对同一文本再次分割会跳过场景提取和已完成的块，只重新请求失败的块。
+        """
+        llm_config = self.config['llm']
+        chunk_tokens = llm_config.get('chunk_tokens', 0)
+        window_size = llm_config.get('window_size', -1)
+        chunk_retries = max(0, int(llm_config.get('chunk_retries', 2)))
+        retry_delay = llm_config.get('chunk_retry_delay', 1.0)
         
         # 预处理文本
         split_pattern = r'(?<=[。！？])(?![^""]*"")\s*'
         sentences = [s.replace('\n', ' ').strip() for s in re.split(split_pattern, text) if s.strip()]
         text = "\n".join(sentences)
 
+        # json 模式直接调用 LLM 并校验输出；agent 模式沿用无工具的 Agent
+        use_agent = llm_config.get('split_mode', 'json') == 'agent'
+
+        # 处理文本块：优先按 token 预算装箱，未配置时退回按句数分窗
+        if chunk_tokens > 0:
+            text_chunks = pack_sentences(sentences, chunk_tokens, llm_config.get('chunk_overlap_tokens', 0))
+        else:
+            text_chunks = [('', text)] if window_size <= 0 else [
+                ('', "\n".join(sentences[i:i+window_size]))
+                for i in range(0, len(sentences), window_size)
+            ]
+
+        # 同一项目、同一分块结果和调用方式对应同一个分割任务，存在未完成的任务时从中恢复
+        job_id = 'split_' + LLMResponseCache.make_key(
+            project_name, self.model_name, llm_config.get('split_mode', 'json'), text_chunks
+        )[:24]
+        job = self.split_jobs.load(job_id)
+        if job is None or job.get('chunk_count') != len(text_chunks):
+            self._prune_split_jobs()
+            job = {'id': job_id, 'project_name': project_name, 'chunk_count': len(text_chunks),
+                   'scenes_done': False, 'chunks': {}}
+        else:
+            done = sum(1 for record in job['chunks'].values() if record['status'] == 'done')
+            logger.info(f"恢复分割任务 {job_id}：已完成 {done}/{len(text_chunks)} 块")
+        job['status'] = 'running'
+
         # 场景提取
-        scene_generation_prompt_template = self._load_prompt("scene_extraction.txt")
-        scene_names = self.scene_service.get_scene_names(project_name)
-        system_prompt_for_scene = scene_generation_prompt_template.replace("{scenes}", ",".join(scene_names))
-        
-        # 创建LangChain Agent
-        agent_executor_scene = self._create_agent_executor()
-        #组合提示词并调用，其中system_prompt_for_scene是系统提示词，text是用户输入的文本，project_name是项目名称
-        response_scene = await agent_executor_scene.ainvoke(self.combine_prompts(system_prompt_for_scene, text, project_name))
-        response=response_scene['output']
-        self.scene_service.update_scenes(project_name, response)
+        if not job['scenes_done']:
+            scene_generation_prompt_template = self._load_prompt("scene_extraction.txt")
+            scene_names = self.scene_service.get_scene_names(project_name)
+            system_prompt_for_scene = scene_generation_prompt_template.replace("{scenes}", ",".join(scene_names))
+
+            #组合提示词并调用，其中system_prompt_for_scene是系统提示词，text是用户输入的文本，project_name是项目名称
+            scene_messages = self.combine_prompts(system_prompt_for_scene, text, project_name)
+            if use_agent:
+                response = (await self._invoke_agent(scene_messages))['output']
+            else:
+                response = await self._invoke_json('scenes', scene_messages, self._validate_scenes)
+            self.scene_service.update_scenes(project_name, response)
+            job['scenes_done'] = True
+            self._save_split_job(job)
 
         # 文本描述生成
         text_desc_prompt_template = self._load_prompt("text_desc_prompt.txt")
@@ -127,22 +395,75 @@ class LLMService(SingletonService):
         current_text_desc_prompt = text_desc_prompt_template.replace("{scenes}", ",".join(scene_names))
         current_text_desc_prompt = current_text_desc_prompt.replace("{entities}", ",".join(entities_names))
 
-        # 处理文本块
-        text_chunks = [text] if window_size <= 0 else [
-            "\n".join(sentences[i:i+window_size]) 
-            for i in range(0, len(sentences), window_size)
-        ]
+        async def process_chunk(index, context, chunk):
+            """处理一个文本块，返回片段列表；重试后仍失败时返回 None"""
+            record = job['chunks'].get(str(index))
+            if record and record['status'] == 'done':
+                return record['spans']
+            record = {'status': 'pending', 'attempts': record['attempts'] if record else 0, 'error': None, 'spans': []}
+            job['chunks'][str(index)] = record
+
+            if context:
+                chunk = f"[上文，仅供理解人物和场景，不要为其生成片段]\n{context}\n\n[需要处理的文本]\n{chunk}"
+            messages = self.combine_prompts(current_text_desc_prompt, chunk)
+            for attempt in range(chunk_retries + 1):
+                record['attempts'] += 1
+                try:
+                    spans = await self._generate_chunk_spans(messages, use_agent)
+                except Exception as e:
+                    record['error'] = str(e)
+                    logger.warning(f"文本块 {index + 1}/{len(text_chunks)} 处理失败（第 {attempt + 1} 次）：{str(e)}")
+                    if attempt < chunk_retries:
+                        # 全抖动指数退避
+                        await asyncio.sleep(random.uniform(0, retry_delay * (2 ** attempt)))
+                    continue
+                record.update(status='done', error=None, spans=spans)
+                self._save_split_job(job)
+                return spans
+            record['status'] = 'failed'
+            self._save_split_job(job)
+            return None
+
+        tasks = [asyncio.create_task(process_chunk(index, context, chunk))
+                 for index, (context, chunk) in enumerate(text_chunks)]
+        try:
+            for index, task in enumerate(tasks):
+                spans = await task
+                if spans is None:
+                    # 等其余块完成并记录结果，下次只需重新请求失败的块
+                    await asyncio.gather(*tasks)
+                    failed = [str(i + 1) for i, t in enumerate(tasks) if t.result() is None]
+                    job['status'] = 'failed'
+                    self._save_split_job(job)
+                    raise Exception(
+                        f"{len(failed)}/{len(tasks)} 个文本块处理失败（第 {', '.join(failed)} 块），"
+                        f"再次分割将只重新请求失败的块"
+                    )
+                yield index, len(tasks), spans
+            self.split_jobs.delete(job_id)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_chunk_spans(self, messages: List, use_agent: bool) -> List[dict]:
+        """为一个文本块生成片段，结果不合格时抛出 ValueError
+
+        每次只调用一次 LLM，校验失败也计入 chunk_retries，单块最多请求 chunk_retries + 1 次
+        """
+        if not use_agent:
+            return await self._invoke_json('spans', messages, self._validate_spans, max_attempts=1)
+        response = await self._invoke_agent(
+            messages, validate=lambda output: self._validate_spans(parse_json_output(output)), kind='agent:spans'
+        )
+        return response['output']
 
-        async def process_chunk(chunk):
-            response = await agent_executor_scene.ainvoke(self.combine_prompts(current_text_desc_prompt, chunk))
-            try:
-                return response['output']["spans"]
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Error parsing LLM response for text description: {e}. Response: {response['putput']}")
-                return []
+    def _save_split_job(self, job: dict) -> None:
+        job['updated'] = time.time()
+        self.split_jobs.save(job['id'], job)
 
-        results = await asyncio.gather(*[process_chunk(chunk) for chunk in text_chunks])
-        return [item for sublist in results for item in sublist]
+    def _prune_split_jobs(self) -> None:
+        """删除长时间未更新的分割任务"""
+        self.split_jobs.prune(SPLIT_JOB_TTL)
 
     async def generate_text(self, prompt: str, project_name: str, last_content: str = '') -> AsyncGenerator[str, None]:
         """生成文本"""
@@ -153,8 +474,13 @@ class LLMService(SingletonService):
         system_prompt = system_prompt.replace('{context}', last_content)
         system_prompt = system_prompt.replace('{requirements}', prompt)
         
-        async for token in self._process_text_stream(self.combine_prompts(system_prompt, prompt)):
-            yield token
+        stream = self._process_text_stream(self.combine_prompts(system_prompt, prompt))
+        try:
+            async for token in stream:
+                yield token
+        finally:
+            # 显式关闭内层生成器，使上游调用随外层生成器的关闭立即取消
+            await stream.aclose()
 
     async def continue_story(self, original_story: str, project_name: str, last_content: str = '') -> AsyncGenerator[str, None]:
         """续写故事"""
@@ -164,8 +490,13 @@ class LLMService(SingletonService):
         system_prompt = self._load_prompt('story_continuation.txt')
         system_prompt = system_prompt.replace('{context}', last_content)
         
-        async for token in self._process_text_stream(self.combine_prompts(system_prompt, original_story)):
-            yield token
+        stream = self._process_text_stream(self.combine_prompts(system_prompt, original_story))
+        try:
+            async for token in stream:
+                yield token
+        finally:
+            # 显式关闭内层生成器，使上游调用随外层生成器的关闭立即取消
+            await stream.aclose()
 
     def combine_prompts(self,system_prompt,text,project_name=""):
         """组合系统提示词和用户输入"""
@@ -200,7 +531,8 @@ class LLMService(SingletonService):
         # 创建LangChain Agent
         agent = self._create_agent_executor( self.kg_service.get_tools())
  
-        result_text =await agent.ainvoke(self.combine_prompts(system_prompt,text,project_name)) 
+        messages = self.combine_prompts(system_prompt, text, project_name)
+        result_text = await agent.ainvoke(messages)
         
         final_answer = result_text.get('output') if isinstance(result_text, dict) else str(result_text)
         
@@ -287,29 +619,25 @@ class LLMService(SingletonService):
                     HumanMessage(content=prompts_str)
                 ]
                 
+                def parse_batch(result: str, expected: int = len(batch_prompts)) -> List[str]:
+                    batch_results = []
+                    # 使用正则表达式匹配编号的提示词
+                    pattern = r'^\d+\.\s*(.+)$'
+                    for line in result.strip().split('\n'):
+                        line = line.strip()
+                        if line:
+                            match = re.match(pattern, line)
+                            if match:
+                                batch_results.append(match.group(1).strip())
+                    # 确保当前批次的翻译结果数量正确，数量不对的回复不会写入缓存
+                    if len(batch_results) != expected:
+                        raise ValueError(f"批次 {batch_index + 1} 的翻译结果数量 ({len(batch_results)}) 与输入数量 ({expected}) 不匹配")
+                    return batch_results
+
                 # 使用 LangChain 调用 LLM
-                response = await self.llm.ainvoke(messages)
-                result = response.content.strip()
-                batch_results = []
-                
-                # 使用正则表达式匹配编号的提示词
-                pattern = r'^\d+\.\s*(.+)$'
-                for line in result.split('\n'):
-                    line = line.strip()
-                    if line:
-                        match = re.match(pattern, line)
-                        if match:
-                            batch_results.append(match.group(1).strip())
-                
-                # 确保当前批次的翻译结果数量正确
-                if len(batch_results) != len(batch_prompts):
-                    raise Exception(f"批次 {batch_index + 1} 的翻译结果数量 ({len(batch_results)}) 与输入数量 ({len(batch_prompts)}) 不匹配")
+                batch_results = await self._invoke_llm(messages, validate=parse_batch, kind='chat:translate')
                 
                 translated_prompts.extend(batch_results)
-                
-                # 在批次之间添加短暂延迟，避免触发速率限制
-                if batch_index < total_batches - 1:
-                    await asyncio.sleep(0.5)
             
             # 最终验证
             if len(translated_prompts) != len(prompts):
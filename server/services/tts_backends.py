@@ -0,0 +1,144 @@
+import asyncio
+import random
+import re
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional
+import edge_tts
+import logging
+
+logger = logging.getLogger(__name__)
+
+TICKS_PER_SECOND = 10_000_000  # WordBoundary 的 offset/duration 以 100ns 为单位
+
+
+class TTSBackend(ABC):
+    """TTS 后端接口
+
+    stream() 以 edge-tts 的格式逐块返回结果：
+    ``{'type': 'audio', 'data': bytes}`` 和
+    ``{'type': 'WordBoundary', 'offset': int, 'duration': int, 'text': str}``（仅 word_boundary=True 时）。
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def stream(self, text: str, voice: str, rate: str = '+0%',
+               word_boundary: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """合成 text，逐块产出音频和（可选的）WordBoundary"""
+
+
+class EdgeTTSBackend(TTSBackend):
+    """微软 Edge 在线语音合成（默认后端）"""
+
+    name = 'edge'
+
+    async def stream(self, text: str, voice: str, rate: str = '+0%',
+                     word_boundary: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        if word_boundary:
+            communicate = edge_tts.Communicate(text, voice, rate=rate, boundary='WordBoundary')
+        else:
+            communicate = edge_tts.Communicate(text, voice, rate=rate)
+        async for chunk in communicate.stream():
+            yield chunk
+
+
+class LocalTTSBackend(TTSBackend):
+    """离线替身后端，用于测试和基准测试
+
+    不访问网络，按文本长度生成确定性的静音 MP3（24kHz 单声道 MPEG-2 Layer III，
+    与 edge-tts 输出格式一致），并给出与 edge-tts 相同格式的 WordBoundary。
+    耗时模型：首包延迟 first_byte_latency，之后按音频时长 × realtime_factor 的速度推送，
+    可选按 fail_rate 随机失败以测试重试逻辑。
+    """
+
+    name = 'local'
+
+    FRAME_DURATION = 0.024  # 576 采样 / 24000Hz
+    # MPEG-2 Layer III, 48kbps, 24kHz, 单声道；帧体全零即静音帧
+    FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+    FRAMES_PER_CHUNK = 20  # 每个音频块包含的帧数（约 0.5 秒）
+
+    WORD_PATTERN = re.compile(r'[A-Za-z0-9]+|[^\sA-Za-z0-9，。！？；：、,.!?;:…“”"\'（）()《》]')
+    PAUSES = {'。': 0.35, '！': 0.35, '？': 0.35, '.': 0.35, '!': 0.35, '?': 0.35, '\n': 0.35,
+              '，': 0.15, ',': 0.15, '；': 0.2, ';': 0.2, '、': 0.1, '：': 0.15, ':': 0.15}
+
+    def __init__(self, chars_per_second: float = 4.5, first_byte_latency: float = 0.3,
+                 realtime_factor: float = 0.1, fail_rate: float = 0.0, seed: Optional[int] = None):
+        self.chars_per_second = chars_per_second
+        self.first_byte_latency = first_byte_latency
+        self.realtime_factor = realtime_factor
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self.stats = {'requests': 0, 'failures': 0, 'chars': 0, 'audio_seconds': 0.0}
+
+    @staticmethod
+    def _rate_factor(rate: str) -> float:
+        """'+20%' -> 1.2"""
+        try:
+            return max(0.1, 1 + int(rate.strip().rstrip('%')) / 100)
+        except (AttributeError, ValueError):
+            return 1.0
+
+    def _timeline(self, text: str, rate: str) -> tuple:
+        """计算每个词的 (开始秒, 时长秒, 文本) 以及总时长。"""
+        speed = self._rate_factor(rate)
+        char_time = 1.0 / (self.chars_per_second * speed)
+        words = []
+        elapsed = 0.1  # 开头的短暂静音
+        position = 0
+        for match in self.WORD_PATTERN.finditer(text):
+            for ch in text[position:match.start()]:
+                elapsed += self.PAUSES.get(ch, 0.0) / speed
+            word = match.group()
+            if word.isascii():
+                duration = char_time * max(1.0, len(word) / 3)  # 英文单词按音节粗略估计
+            else:
+                duration = char_time * len(word)
+            words.append((elapsed, duration, word))
+            elapsed += duration
+            position = match.end()
+        for ch in text[position:]:
+            elapsed += self.PAUSES.get(ch, 0.0) / speed
+        return words, elapsed + 0.2
+
+    async def stream(self, text: str, voice: str, rate: str = '+0%',
+                     word_boundary: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        self.stats['requests'] += 1
+        self.stats['chars'] += len(text)
+        await asyncio.sleep(self.first_byte_latency)
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            self.stats['failures'] += 1
+            raise ConnectionError('simulated TTS failure')
+
+        words, total = self._timeline(text, rate)
+        frame_count = max(1, round(total / self.FRAME_DURATION))
+        self.stats['audio_seconds'] += frame_count * self.FRAME_DURATION
+
+        word_index = 0
+        for first in range(0, frame_count, self.FRAMES_PER_CHUNK):
+            count = min(self.FRAMES_PER_CHUNK, frame_count - first)
+            if self.realtime_factor:
+                await asyncio.sleep(count * self.FRAME_DURATION * self.realtime_factor)
+            yield {'type': 'audio', 'data': self.FRAME * count}
+
+            # 与 edge-tts 一样，词边界在对应音频之后到达
+            chunk_end = (first + count) * self.FRAME_DURATION
+            while word_boundary and word_index < len(words) and words[word_index][0] < chunk_end:
+                start, duration, word = words[word_index]
+                yield {
+                    'type': 'WordBoundary',
+                    'offset': int(start * TICKS_PER_SECOND),
+                    'duration': int(duration * TICKS_PER_SECOND),
+                    'text': word
+                }
+                word_index += 1
+
+
+def create_tts_backend(tts_config: Dict[str, Any]) -> TTSBackend:
+    """根据 tts.backend 配置创建后端：edge（默认）或 local。"""
+    backend = (tts_config.get('backend') or 'edge').lower()
+    if backend == 'edge':
+        return EdgeTTSBackend()
+    if backend == 'local':
+        return LocalTTSBackend(**(tts_config.get('local') or {}))
+    raise ValueError(f"Unsupported TTS backend: {backend}")
@@ -0,0 +1,114 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发限制器
+
+    每次请求成功且耗时低于 latency_target 时，并发上限加性增长（每满一个窗口约 +1）；
+    请求失败或耗时超标时乘性减小。减小动作在 cooldown 内只生效一次，
+    避免同一波并发请求同时失败时把上限一次压到底。
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 latency_target: float = 10.0, decrease_factor: float = 0.5,
+                 cooldown: float = 2.0):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, int(initial))))
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, success: Optional[bool], latency: Optional[float] = None) -> None:
+        """归还并发槽位，并根据结果调整上限；success 为 None（如被取消）时不调整。"""
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+            if success is None:
+                return
+            overloaded = latency is not None and latency > self.latency_target
+            if success and not overloaded:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            else:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    logger.info(f"TTS 并发上限降至 {int(self.limit)}（{'超时' if overloaded else '失败'}）")
+
+    def stats(self) -> Dict[str, Any]:
+        return {'limit': int(self.limit), 'in_flight': self.in_flight}
+
+
+class TTSScheduler:
+    """TTS 请求调度器
+
+    所有批次共享同一个 AdaptiveConcurrencyLimiter，限制同时打开的 TTS 连接数。
+    单条失败后按指数退避加随机抖动重试，重试次数用尽才视为失败，不影响同批次其他条目。
+    """
+
+    def __init__(self, max_concurrency: int = 8, min_concurrency: int = 1,
+                 initial_concurrency: int = 4, latency_target: float = 10.0,
+                 max_retries: int = 3, retry_base_delay: float = 1.0,
+                 retry_max_delay: float = 30.0):
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial=initial_concurrency,
+            min_limit=min_concurrency,
+            max_limit=max_concurrency,
+            latency_target=latency_target
+        )
+        self.max_retries = max(0, int(max_retries))
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+    def _backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter）。"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    async def run(self, func: Callable[[], Awaitable[Any]],
+                  is_cancelled: Callable[[], bool] = lambda: False,
+                  on_retry: Optional[Callable[[int, Exception], None]] = None) -> Any:
+        """在并发限制下执行 func 并返回其结果，失败时重试。
+
+        func 每次调用都应重新发起完整的请求；等待槽位期间任务被取消时返回 None。
+        """
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            if is_cancelled():
+                await self.limiter.release(None)
+                return None
+            start = time.monotonic()
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                await self.limiter.release(None)
+                raise
+            except Exception as e:
+                await self.limiter.release(False)
+                if attempt >= self.max_retries or is_cancelled():
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning(f"TTS 请求失败，{delay:.1f}s 后第 {attempt} 次重试: {str(e)}")
+                if on_retry:
+                    on_retry(attempt, e)
+                await asyncio.sleep(delay)
+                continue
+            await self.limiter.release(True, time.monotonic() - start)
+            return result
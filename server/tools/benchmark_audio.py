@@ -0,0 +1,178 @@
+"""AudioService 吞吐基准测试。
+
+用离线的 LocalTTSBackend 替代 edge-tts，驱动一批长短混合的文本走完整的音频批处理流程
+（缓存、短span合并、长span分块、调度与重试、文件写入），统计每秒完成的span数、
+实际发出的 TTS 请求数，以及没有任何 TTS 请求在进行时的“空转”时间——即流水线自身的开销。
+
+用法：
+    python -m server.tools.benchmark_audio --spans 200 --latency 0.3 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from server.services.audio_service import AudioService
+from server.services.tts_backends import LocalTTSBackend
+from server.services.tts_scheduler import TTSScheduler
+from server.utils.job_store import JobStore
+from server.utils.media_cache import MediaCache
+from server.utils import mp3_utils
+
+SENTENCES = [
+    '好的。', '你来了？', '快走！', '他点了点头。', '门外传来一阵脚步声。',
+    '雨下得越来越大，街上几乎看不到行人。',
+    '她把信放回抽屉里，犹豫了很久，最终还是没有拆开。',
+    '远处的山峦在夕阳下泛着金色的光，风吹过麦田，掀起一层层波浪。',
+]
+
+
+class InstrumentedBackend(LocalTTSBackend):
+    """记录请求耗时以及“至少有一个请求在进行”的总时间。"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.busy_time = 0.0
+        self.request_time = 0.0
+        self._busy_since = None
+
+    async def stream(self, *args, **kwargs):
+        start = time.perf_counter()
+        if self.active == 0:
+            self._busy_since = start
+        self.active += 1
+        try:
+            async for chunk in super().stream(*args, **kwargs):
+                yield chunk
+        finally:
+            self.active -= 1
+            now = time.perf_counter()
+            self.request_time += now - start
+            if self.active == 0:
+                self.busy_time += now - self._busy_since
+
+
+def make_texts(count: int, long_ratio: float, seed: int) -> list:
+    """生成长短混合的文本：大部分是一两句对白，按 long_ratio 混入长段叙述。"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        if rng.random() < long_ratio:
+            texts.append(''.join(rng.choice(SENTENCES[4:]) for _ in range(rng.randint(8, 14))))
+        else:
+            texts.append(''.join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 2))))
+    return texts
+
+
+async def run_batch(service: AudioService, texts: list, output_dirs: list) -> dict:
+    result = await service.generate_audio(texts, output_dirs)
+    task_id = result['task_id']
+    while True:
+        progress = service.get_generation_progress(task_id)
+        if progress['status'] not in ('running', 'cancelling'):
+            return progress
+        await asyncio.sleep(0.02)
+
+
+async def run_benchmark(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix='audio_bench_')
+    backend = InstrumentedBackend(
+        first_byte_latency=args.latency,
+        realtime_factor=args.realtime_factor,
+        fail_rate=args.fail_rate,
+        seed=0
+    )
+
+    # AudioService 是单例，临时替换的属性在结束时恢复，任务记录也写到临时目录，不影响真实的缓存和任务列表
+    service = AudioService()
+    overrides = {
+        'backend': backend,
+        'use_cache': args.cache,
+        'audio_cache': MediaCache(os.path.join(work_dir, 'cache'), '.mp3'),
+        'job_store': JobStore(os.path.join(work_dir, 'jobs')),
+        'pack_short_spans': not args.no_pack,
+        'long_span_chars': float('inf') if args.no_chunk else service.long_span_chars,
+        'scheduler': TTSScheduler(
+            max_concurrency=args.concurrency,
+            initial_concurrency=args.concurrency,
+            retry_base_delay=0.05
+        ),
+    }
+    originals = {name: getattr(service, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(service, name, value)
+
+    texts = make_texts(args.spans, args.long_ratio, seed=1)
+    output_dirs = [os.path.join(work_dir, 'spans', str(i + 1)) for i in range(args.spans)]
+
+    start = time.perf_counter()
+    try:
+        progress = await run_batch(service, texts, output_dirs)
+    finally:
+        for name, value in originals.items():
+            setattr(service, name, value)
+    elapsed = time.perf_counter() - start
+
+    audio_seconds = 0.0
+    saved = 0
+    for output_dir in output_dirs:
+        path = os.path.join(output_dir, 'audio.mp3')
+        if os.path.exists(path):
+            saved += 1
+            with open(path, 'rb') as f:
+                audio_seconds += mp3_utils.duration(f.read())
+
+    return {
+        'status': progress['status'],
+        'spans': args.spans,
+        'saved': saved,
+        'cached': progress.get('cached', 0),
+        'errors': len(progress.get('errors', [])),
+        'retries': progress.get('retries', 0),
+        'requests': backend.stats['requests'],
+        'packed_requests': progress.get('packed_requests', 0),
+        'chunked_spans': progress.get('chunked_spans', 0),
+        'elapsed': elapsed,
+        'spans_per_second': saved / elapsed if elapsed > 0 else 0.0,
+        'audio_seconds': audio_seconds,
+        'avg_request_ms': backend.request_time * 1000 / max(1, backend.stats['requests']),
+        'idle_ms': max(0.0, elapsed - backend.busy_time) * 1000,
+        'work_dir': work_dir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AudioService 吞吐基准测试')
+    parser.add_argument('--spans', type=int, default=100, help='span数量')
+    parser.add_argument('--long-ratio', type=float, default=0.1, help='长段叙述所占比例')
+    parser.add_argument('--latency', type=float, default=0.3, help='替身后端的首包延迟（秒）')
+    parser.add_argument('--realtime-factor', type=float, default=0.1, help='合成耗时与音频时长之比')
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=8, help='TTS 并发上限')
+    parser.add_argument('--cache', action='store_true', help='启用合成结果缓存')
+    parser.add_argument('--no-pack', action='store_true', help='关闭短span合并')
+    parser.add_argument('--no-chunk', action='store_true', help='关闭长span分块')
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    print(f"status:            {report['status']}")
+    print(f"spans:             {report['saved']}/{report['spans']} saved, {report['cached']} cached, "
+          f"{report['errors']} errors, {report['retries']} retries")
+    print(f"tts requests:      {report['requests']} ({report['packed_requests']} packed, "
+          f"{report['chunked_spans']} spans chunked)")
+    print(f"elapsed:           {report['elapsed']:.2f}s")
+    print(f"throughput:        {report['spans_per_second']:.1f} spans/s, "
+          f"{report['audio_seconds'] / report['elapsed']:.1f}x realtime")
+    print(f"avg request:       {report['avg_request_ms']:.1f} ms")
+    print(f"pipeline idle:     {report['idle_ms']:.1f} ms (no TTS request in flight)")
+    print(f"output:            {report['work_dir']}")
+
+
+if __name__ == '__main__':
+    main()
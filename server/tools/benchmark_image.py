@@ -0,0 +1,125 @@
+"""ImageService 吞吐基准测试。
+
+在本地启动 fake_comfyui 替身服务，用 ImageService.generate_images 驱动一批提示词，
+统计每秒生成的图片数以及各阶段（prepare/submit/execute/save）的平均耗时，
+execute 阶段扣除模拟的 GPU 时间后即为流水线自身的开销。
+
+用法：
+    python -m server.tools.benchmark_image --images 50 --latency 0.2 --workers 2
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from server.services.image_service import ImageService
+from server.tools.fake_comfyui import create_app
+from server.utils.media_cache import MediaCache
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fake_server(latency: float, jitter: float, fail_rate: float, steps: int) -> str:
+    """在后台线程中启动替身服务，返回其地址。"""
+    import uvicorn
+
+    port = _free_port()
+    app = create_app(latency=latency, jitter=jitter, fail_rate=fail_rate, steps=steps, seed=0)
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError('fake ComfyUI failed to start')
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_benchmark(args) -> dict:
+    url = start_fake_server(args.latency, args.jitter, args.fail_rate, args.steps)
+    work_dir = tempfile.mkdtemp(prefix='image_bench_')
+
+    # ImageService 初始化时按 cache_path 创建缓存目录，指向临时目录以免创建或写入真实的缓存
+    config = dict(ImageService.get_config())
+    config['cache_path'] = os.path.join(work_dir, 'cache')
+    ImageService._config = config
+    service = ImageService()
+    service.comfyui_url = url
+    service.use_cache = args.cache
+    service.image_cache = MediaCache(os.path.join(work_dir, 'cache', 'images'), '.png')
+    service.scheduler.max_workers = args.workers
+
+    prompts = [f"benchmark prompt {i % args.unique}" for i in range(args.images)]
+    output_dirs = [os.path.join(work_dir, 'spans', str(i + 1)) for i in range(args.images)]
+    params = {'width': args.width, 'height': args.height, 'style': 'anime', 'variants': args.variants}
+    if args.seed:
+        params['seed'] = args.seed
+
+    start = time.perf_counter()
+    result = service.generate_images(prompts, output_dirs, workflow=args.workflow, params=params)
+    task_id = result['task_id']
+    while True:
+        progress = service.get_generation_progress(task_id)
+        if progress['status'] not in ('running', 'cancelling'):
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    saved = sum(1 for d in output_dirs if os.path.exists(os.path.join(d, 'image.png')))
+    timings = progress.get('timings', {})
+    executed = max(1, args.images - progress.get('cached', 0))
+    return {
+        'status': progress['status'],
+        'images': args.images,
+        'saved': saved,
+        'cached': progress.get('cached', 0),
+        'errors': len(progress.get('errors', [])),
+        'elapsed': elapsed,
+        'images_per_second': saved / elapsed if elapsed > 0 else 0.0,
+        'stage_avg_ms': {stage: value * 1000 / executed for stage, value in timings.items()},
+        'pipeline_overhead_ms': (elapsed / max(1, args.images) - args.latency) * 1000,
+        'work_dir': work_dir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ImageService 吞吐基准测试')
+    parser.add_argument('--images', type=int, default=20, help='提示词数量')
+    parser.add_argument('--unique', type=int, default=1000000, help='不同提示词的数量，小于 images 时会产生重复')
+    parser.add_argument('--latency', type=float, default=0.2, help='替身服务每个任务的模拟执行时间（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--steps', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=1, help='ImageService 调度器工作线程数')
+    parser.add_argument('--variants', type=int, default=1)
+    parser.add_argument('--width', type=int, default=512)
+    parser.add_argument('--height', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=0, help='固定种子（配合 --cache 测试缓存命中）')
+    parser.add_argument('--cache', action='store_true', help='启用生成结果缓存')
+    parser.add_argument('--workflow', default='nunchaku-flux.1-dev.json')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print(f"status:            {report['status']}")
+    print(f"images:            {report['saved']}/{report['images']} saved, {report['cached']} cached, {report['errors']} errors")
+    print(f"elapsed:           {report['elapsed']:.2f}s")
+    print(f"throughput:        {report['images_per_second']:.2f} images/s")
+    print(f"overhead/image:    {report['pipeline_overhead_ms']:.1f} ms (wall time minus simulated latency)")
+    for stage, value in report['stage_avg_ms'].items():
+        print(f"  {stage:<16} {value:.1f} ms")
+    print(f"output:            {report['work_dir']}")
+
+
+if __name__ == '__main__':
+    main()
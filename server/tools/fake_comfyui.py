@@ -0,0 +1,288 @@
+"""离线的 ComfyUI 替身服务，用于在没有 GPU 的机器上测试 ImageService 的吞吐。
+
+实现了 ImageService 用到的接口：/prompt、/ws、/history、/view、/queue、/interrupt。
+每个任务按配置的延迟（可带抖动）模拟采样过程，推送 progress/executing 等消息，
+并按概率注入失败；生成的图片是根据文件名确定性绘制的 PNG。
+
+用法：
+    python -m server.tools.fake_comfyui --port 8188 --latency 1.5 --fail-rate 0.05
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import uuid
+import hashlib
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from PIL import Image, ImageDraw
+
+
+def render_png(filename: str, width: int, height: int) -> bytes:
+    """根据文件名确定性地绘制一张渐变 + 几何图形的 PNG。"""
+    digest = hashlib.sha256(filename.encode('utf-8')).digest()
+    c1 = tuple(digest[0:3])
+    c2 = tuple(digest[3:6])
+    image = Image.new('RGB', (width, height), c1)
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 4):
+        t = y / max(1, height - 1)
+        color = tuple(int(a + (b - a) * t) for a, b in zip(c1, c2))
+        draw.rectangle([0, y, width, y + 4], fill=color)
+    for i in range(6):
+        x = digest[6 + i] * width // 255
+        y = digest[12 + i] * height // 255
+        r = 10 + digest[18 + i] % max(10, min(width, height) // 4)
+        draw.ellipse([x - r, y - r, x + r, y + r], outline=tuple(digest[24:27]), width=3)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _find_latent_inputs(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    for node in workflow.values():
+        if isinstance(node, dict) and node.get('class_type') in ('EmptyLatentImage', 'EmptySD3LatentImage'):
+            return node.get('inputs', {})
+    return {}
+
+
+def _find_sampler(workflow: Dict[str, Any]) -> Optional[str]:
+    for node_id, node in workflow.items():
+        if isinstance(node, dict) and node.get('class_type') in ('KSampler', 'SamplerCustomAdvanced'):
+            return node_id
+    return None
+
+
+def _find_output_node(workflow: Dict[str, Any]) -> str:
+    for node_id, node in workflow.items():
+        if isinstance(node, dict) and node.get('class_type') in ('SaveImage', 'PreviewImage'):
+            return node_id
+    return '9'
+
+
+class FakeComfyUI:
+    """单 GPU 的串行执行模拟器"""
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.0, fail_rate: float = 0.0,
+                 steps: Optional[int] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.steps = steps
+        self.random = random.Random(seed)
+
+        self.clients: Dict[str, WebSocket] = {}
+        self.pending: List[Dict[str, Any]] = []
+        self.running: Optional[Dict[str, Any]] = None
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.images: Dict[str, Dict[str, int]] = {}  # filename -> 尺寸
+        self.counter = 0
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'interrupted': 0}
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._interrupted = False
+
+    async def send(self, client_id: str, msg_type: str, data: Dict[str, Any]) -> None:
+        websocket = self.clients.get(client_id)
+        if websocket is None:
+            return
+        try:
+            await websocket.send_json({'type': msg_type, 'data': data})
+        except Exception:
+            self.clients.pop(client_id, None)
+
+    async def broadcast_status(self) -> None:
+        remaining = len(self.pending) + (1 if self.running else 0)
+        for client_id in list(self.clients):
+            await self.send(client_id, 'status', {'status': {'exec_info': {'queue_remaining': remaining}}})
+
+    def submit(self, workflow: Dict[str, Any], client_id: str) -> Dict[str, Any]:
+        prompt_id = str(uuid.uuid4())
+        self.counter += 1
+        job = {'prompt_id': prompt_id, 'number': self.counter, 'prompt': workflow, 'client_id': client_id}
+        self.pending.append(job)
+        self.stats['submitted'] += 1
+        if self._wakeup:
+            self._wakeup.set()
+        return {'prompt_id': prompt_id, 'number': self.counter, 'node_errors': {}}
+
+    def delete(self, prompt_ids: List[str]) -> None:
+        self.pending = [job for job in self.pending if job['prompt_id'] not in prompt_ids]
+
+    def interrupt(self, prompt_id: Optional[str] = None) -> None:
+        if self.running and (prompt_id is None or self.running['prompt_id'] == prompt_id):
+            self._interrupted = True
+
+    async def run(self) -> None:
+        """串行执行队列中的任务。"""
+        self._wakeup = asyncio.Event()
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self.running = self.pending.pop(0)
+            try:
+                await self._execute(self.running)
+            finally:
+                self.running = None
+                self._interrupted = False
+                await self.broadcast_status()
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        prompt_id = job['prompt_id']
+        client_id = job['client_id']
+        workflow = job['prompt']
+        sampler_id = _find_sampler(workflow)
+        output_id = _find_output_node(workflow)
+        latent = _find_latent_inputs(workflow)
+        width = int(latent.get('width', 512))
+        height = int(latent.get('height', 512))
+        batch_size = max(1, int(latent.get('batch_size', 1)))
+        steps = self.steps or int((workflow.get(sampler_id, {}).get('inputs', {}) if sampler_id else {}).get('steps', 20))
+
+        await self.send(client_id, 'execution_start', {'prompt_id': prompt_id})
+        await self.send(client_id, 'executing', {'node': sampler_id, 'prompt_id': prompt_id})
+
+        duration = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        for step in range(1, steps + 1):
+            await asyncio.sleep(duration / steps)
+            if self._interrupted:
+                self.stats['interrupted'] += 1
+                await self.send(client_id, 'execution_interrupted', {'prompt_id': prompt_id, 'node_id': sampler_id})
+                self.history[prompt_id] = {'outputs': {}, 'status': {'status_str': 'error', 'completed': False}}
+                return
+            await self.send(client_id, 'progress', {'value': step, 'max': steps, 'prompt_id': prompt_id, 'node': sampler_id})
+
+        if self.random.random() < self.fail_rate:
+            self.stats['failed'] += 1
+            await self.send(client_id, 'execution_error', {
+                'prompt_id': prompt_id,
+                'node_id': sampler_id,
+                'exception_message': 'Injected failure from fake ComfyUI'
+            })
+            self.history[prompt_id] = {'outputs': {}, 'status': {'status_str': 'error', 'completed': False}}
+            return
+
+        images = []
+        for index in range(batch_size):
+            filename = f"fake_{job['number']:05d}_{index:02d}_{prompt_id[:8]}.png"
+            self.images[filename] = {'width': width, 'height': height}
+            images.append({'filename': filename, 'subfolder': '', 'type': 'output'})
+
+        outputs = {output_id: {'images': images}}
+        await self.send(client_id, 'executed', {'node': output_id, 'output': outputs[output_id], 'prompt_id': prompt_id})
+        self.history[prompt_id] = {
+            'prompt': [job['number'], prompt_id, workflow, {}, [output_id]],
+            'outputs': outputs,
+            'status': {'status_str': 'success', 'completed': True}
+        }
+        self.stats['completed'] += 1
+        await self.send(client_id, 'executing', {'node': None, 'prompt_id': prompt_id})
+
+
+def create_app(latency: float = 1.0, jitter: float = 0.0, fail_rate: float = 0.0,
+               steps: Optional[int] = None, seed: Optional[int] = None) -> FastAPI:
+    """创建替身服务的 FastAPI 应用。"""
+    app = FastAPI()
+    fake = FakeComfyUI(latency=latency, jitter=jitter, fail_rate=fail_rate, steps=steps, seed=seed)
+    app.state.fake = fake
+
+    @app.on_event('startup')
+    async def start_worker():
+        asyncio.create_task(fake.run())
+
+    @app.websocket('/ws')
+    async def websocket_endpoint(websocket: WebSocket, clientId: str = ''):
+        await websocket.accept()
+        client_id = clientId or uuid.uuid4().hex
+        fake.clients[client_id] = websocket
+        await fake.send(client_id, 'status', {'sid': client_id, 'status': {'exec_info': {'queue_remaining': len(fake.pending)}}})
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if fake.clients.get(client_id) is websocket:
+                fake.clients.pop(client_id, None)
+
+    @app.post('/prompt')
+    async def post_prompt(request: Request):
+        data = await request.json()
+        result = fake.submit(data.get('prompt', {}), data.get('client_id', ''))
+        await fake.broadcast_status()
+        return result
+
+    @app.get('/history/{prompt_id}')
+    async def get_history(prompt_id: str):
+        if prompt_id in fake.history:
+            return {prompt_id: fake.history[prompt_id]}
+        return {}
+
+    @app.get('/view')
+    async def view(filename: str, subfolder: str = '', type: str = 'output'):
+        size = fake.images.get(filename)
+        if size is None:
+            return Response(status_code=404)
+        png = await asyncio.to_thread(render_png, filename, size['width'], size['height'])
+        return Response(content=png, media_type='image/png')
+
+    @app.get('/queue')
+    async def get_queue():
+        def entry(job):
+            return [job['number'], job['prompt_id'], job['prompt'], {}, []]
+        return {
+            'queue_running': [entry(fake.running)] if fake.running else [],
+            'queue_pending': [entry(job) for job in fake.pending]
+        }
+
+    @app.post('/queue')
+    async def post_queue(request: Request):
+        data = await request.json()
+        if data.get('clear'):
+            fake.pending.clear()
+        if data.get('delete'):
+            fake.delete(data['delete'])
+        return Response(status_code=200)
+
+    @app.post('/interrupt')
+    async def interrupt(request: Request):
+        try:
+            data = await request.json()
+        except Exception:
+            data = {}
+        fake.interrupt((data or {}).get('prompt_id'))
+        return Response(status_code=200)
+
+    @app.get('/fake/stats')
+    async def stats():
+        return fake.stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线 ComfyUI 替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8188)
+    parser.add_argument('--latency', type=float, default=1.0, help='每个任务的模拟执行时间（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='执行时间的随机抖动（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='注入失败的概率 0~1')
+    parser.add_argument('--steps', type=int, default=None, help='覆盖工作流中的采样步数')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子，便于复现')
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(args.latency, args.jitter, args.fail_rate, args.steps, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import os
+import json
+import math
+import uuid
+import hashlib
+import logging
+from typing import Iterable, Optional, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 预设的衍生图尺寸（长边像素）
+DERIVATIVE_SIZES = {
+    'thumb': 256,    # 图库缩略图
+    'preview': 1024  # 中等尺寸预览图
+}
+MIN_SIZE = 32
+MAX_SIZE = 2048
+SIZE_STEP = 32  # 自定义尺寸按此步长取整，避免生成过多不同尺寸的文件
+WEBP_QUALITY = 80
+
+
+def resolve_size(size: Union[str, int, None]) -> tuple:
+    """将尺寸参数解析为 (标签, 长边像素)。"""
+    if size is None or size == '':
+        size = 'thumb'
+    if isinstance(size, str) and size in DERIVATIVE_SIZES:
+        return size, DERIVATIVE_SIZES[size]
+    try:
+        pixels = int(size)
+    except (TypeError, ValueError):
+        raise ValueError(f"Unsupported size: {size}")
+    pixels = max(MIN_SIZE, min(MAX_SIZE, round(pixels / SIZE_STEP) * SIZE_STEP))
+    return f"w{pixels}", pixels
+
+
+def derivative_path(image_path: str, label: str) -> str:
+    """衍生图路径：image.png -> image_thumb.webp。"""
+    stem, _ = os.path.splitext(image_path)
+    return f"{stem}_{label}.webp"
+
+
+def _derivative_label(image_path: str, target_path: str) -> str:
+    """derivative_path 的逆运算：(image.png, image_thumb.webp) -> thumb。"""
+    stem, _ = os.path.splitext(os.path.basename(image_path))
+    return os.path.basename(target_path)[len(stem) + 1:-len('.webp')]
+
+
+def source_record_path(image_path: str) -> str:
+    """记录衍生图来源的文件：image.png -> image.derivatives.json。"""
+    stem, _ = os.path.splitext(image_path)
+    return f"{stem}.derivatives.json"
+
+
+def _load_source_record(image_path: str) -> Optional[dict]:
+    try:
+        with open(source_record_path(image_path), 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        return record if isinstance(record, dict) and 'sha256' in record else None
+    except (OSError, ValueError):
+        return None
+
+
+def _save_source_record(image_path: str, record: dict) -> None:
+    path = source_record_path(image_path)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_fresh(image_path: str, target_path: str) -> bool:
+    """衍生图是否由当前的原图生成。
+
+    生成衍生图时在 image.derivatives.json 中记下原图的大小、mtime、内容哈希和已生成的尺寸标签。
+    原图的大小和 mtime 与记录一致时直接视为有效；不一致时（复制时未保留 mtime、时间戳精度较粗等）
+    再比较内容哈希，内容未变则更新记录中的 mtime。原图可能被缓存中硬链接过来的旧文件替换，
+    所以不能用“衍生图比原图新”来判断。没有记录的旧衍生图沿用 mtime 必须相同的判断。
+    """
+    try:
+        source_stat = os.stat(image_path)
+        target_stat = os.stat(target_path)
+    except OSError:
+        return False
+    record = _load_source_record(image_path)
+    if record is None:
+        return target_stat.st_mtime_ns == source_stat.st_mtime_ns
+
+    if _derivative_label(image_path, target_path) not in record.get('labels', []) or source_stat.st_size != record.get('size'):
+        return False
+    if source_stat.st_mtime_ns == record.get('mtime_ns'):
+        return True
+    if _file_sha256(image_path) != record['sha256']:
+        return False
+    record['mtime_ns'] = source_stat.st_mtime_ns
+    _save_source_record(image_path, record)
+    return True
+
+
+def _write_webp(image: Image.Image, pixels: int, target_path: str, source_stat: os.stat_result) -> None:
+    derivative = image.copy()
+    derivative.thumbnail((pixels, pixels), Image.LANCZOS)
+    tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        derivative.save(tmp_path, format='WEBP', quality=WEBP_QUALITY, method=4)
+        os.utime(tmp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def generate_derivatives(image_path: str, sizes: Iterable[Union[str, int]] = tuple(DERIVATIVE_SIZES)) -> None:
+    """为图片生成（或刷新）WebP 衍生图，只解码一次原图。"""
+    targets = []
+    for size in sizes:
+        label, pixels = resolve_size(size)
+        target_path = derivative_path(image_path, label)
+        if not is_fresh(image_path, target_path):
+            targets.append((label, pixels, target_path))
+    if not targets:
+        return
+
+    source_stat = os.stat(image_path)
+    sha256 = _file_sha256(image_path)
+    with Image.open(image_path) as img:
+        image = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    for _, pixels, target_path in targets:
+        _write_webp(image, pixels, target_path, source_stat)
+
+    # 原图内容未变时保留之前生成的其他尺寸，否则只有本次生成的尺寸有效
+    record = _load_source_record(image_path)
+    labels = set(record.get('labels', [])) if record and record['sha256'] == sha256 else set()
+    labels.update(label for label, _, _ in targets)
+    _save_source_record(image_path, {
+        'size': source_stat.st_size,
+        'mtime_ns': source_stat.st_mtime_ns,
+        'sha256': sha256,
+        'labels': sorted(labels)
+    })
+
+
+def get_derivative(image_path: str, size: Union[str, int, None] = 'thumb') -> Optional[str]:
+    """获取衍生图路径，缺失或过期时即时生成；原图不存在时返回 None。"""
+    if not os.path.isfile(image_path):
+        return None
+    label, _ = resolve_size(size)
+    target_path = derivative_path(image_path, label)
+    if not is_fresh(image_path, target_path):
+        generate_derivatives(image_path, [size])
+    return target_path
+
+
+SPRITE_MAX_TILE = 512
+# 单张精灵图的最大边长。WebP 每边上限为 16383px，这里取更小的值以限制拼图时的内存占用，
+# 章节图片较多时按行分页为多张精灵图
+SPRITE_MAX_SIDE = 4096
+SPRITE_KEEP = 6  # 每个章节保留最近生成的精灵图份数（不同 tile 尺寸各自对应一份）
+
+
+def _chapter_images(chapter_dir: str) -> list:
+    """章节下所有有主图的span：[(span_id, image_path, stat)]，按span序号排序。"""
+    images = []
+    for item in os.listdir(chapter_dir):
+        if not item.isdigit():
+            continue
+        image_path = os.path.join(chapter_dir, item, 'image.png')
+        try:
+            images.append((item, image_path, os.stat(image_path)))
+        except OSError:
+            continue
+    return sorted(images, key=lambda x: int(x[0]))
+
+
+def sprite_key(chapter_dir: str, tile: int) -> str:
+    """根据章节内所有图片的 (span, mtime, size) 计算精灵图的缓存 key。"""
+    digest = hashlib.sha256(f"tile={tile}".encode('utf-8'))
+    for span_id, _, stat in _chapter_images(chapter_dir):
+        digest.update(f"|{span_id}:{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def sprite_sheet_path(sprite_dir: str, key: str, sheet: int) -> str:
+    """第 sheet 张精灵图的路径。"""
+    return os.path.join(sprite_dir, f"{key}_{int(sheet)}.webp")
+
+
+def build_sprite_sheet(chapter_dir: str, sprite_dir: str, tile: int = 160) -> dict:
+    """将章节所有span的缩略图拼成 WebP 精灵图，并返回偏移表。
+
+    结果以内容哈希命名缓存在 sprite_dir 下，任何一张图片变化都会生成新的 key，旧的精灵图随之清理。
+    单张精灵图边长不超过 SPRITE_MAX_SIDE，放不下时分为多张，偏移表中记录每个span所在的 sheet。
+    返回值形如::
+
+        {'key': ..., 'tile': 160, 'columns': 8,
+         'sheets': [{'width': ..., 'height': ...}, ...],
+         'spans': {'1': {'sheet': 0, 'x': 0, 'y': 0, 'w': 107, 'h': 160}, ...}}
+    """
+    tile = max(MIN_SIZE, min(SPRITE_MAX_TILE, int(tile)))
+    key = sprite_key(chapter_dir, tile)
+    map_path = os.path.join(sprite_dir, f"{key}.json")
+    if os.path.exists(map_path):
+        with open(map_path, 'r', encoding='utf-8') as f:
+            sprite_map = json.load(f)
+        if all(os.path.exists(sprite_sheet_path(sprite_dir, key, i)) for i in range(len(sprite_map['sheets']))):
+            return sprite_map
+
+    images = _chapter_images(chapter_dir)
+    max_cells = SPRITE_MAX_SIDE // tile
+    columns = max(1, min(max_cells, math.ceil(math.sqrt(len(images)))))
+    per_sheet = columns * max_cells
+
+    os.makedirs(sprite_dir, exist_ok=True)
+    tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+    sheets = []
+    spans = {}
+    for start in range(0, max(1, len(images)), per_sheet):
+        page = images[start:start + per_sheet]
+        rows = max(1, math.ceil(len(page) / columns))
+        sheet = Image.new('RGB', (columns * tile, rows * tile), (0, 0, 0))
+        for index, (span_id, image_path, _) in enumerate(page):
+            try:
+                # 优先从已生成的缩略图解码，比原图快得多
+                source_path = get_derivative(image_path, 'thumb') if tile <= DERIVATIVE_SIZES['thumb'] else image_path
+                with Image.open(source_path) as img:
+                    thumb = img.convert('RGB')
+            except Exception as e:
+                logger.warning(f"Failed to load {image_path} for sprite sheet: {str(e)}")
+                continue
+            thumb.thumbnail((tile, tile), Image.LANCZOS)
+            x = (index % columns) * tile + (tile - thumb.width) // 2
+            y = (index // columns) * tile + (tile - thumb.height) // 2
+            sheet.paste(thumb, (x, y))
+            spans[span_id] = {'sheet': len(sheets), 'x': x, 'y': y, 'w': thumb.width, 'h': thumb.height}
+
+        sheet_path = sprite_sheet_path(sprite_dir, key, len(sheets))
+        sheet.save(sheet_path + tmp_suffix, format='WEBP', quality=WEBP_QUALITY, method=4)
+        os.replace(sheet_path + tmp_suffix, sheet_path)
+        sheets.append({'width': sheet.width, 'height': sheet.height})
+
+    sprite_map = {
+        'key': key,
+        'tile': tile,
+        'columns': columns,
+        'sheets': sheets,
+        'spans': spans
+    }
+    # 偏移表最后写入，存在即表示全部精灵图已生成
+    with open(map_path + tmp_suffix, 'w', encoding='utf-8') as f:
+        json.dump(sprite_map, f)
+    os.replace(map_path + tmp_suffix, map_path)
+
+    _remove_stale_sprites(sprite_dir, key)
+    return sprite_map
+
+
+def _remove_stale_sprites(sprite_dir: str, current_key: str) -> None:
+    """清理过期的精灵图，只保留最近生成的 SPRITE_KEEP 份。"""
+    maps = sorted(
+        (f for f in os.listdir(sprite_dir) if f.endswith('.json') and not f.startswith(current_key)),
+        key=lambda f: os.path.getmtime(os.path.join(sprite_dir, f))
+    )
+    stale_keys = {f[:-len('.json')] for f in maps[:max(0, len(maps) - (SPRITE_KEEP - 1))]}
+    for filename in os.listdir(sprite_dir):
+        if filename.split('.')[0].split('_')[0] in stale_keys:
+            try:
+                os.remove(os.path.join(sprite_dir, filename))
+            except OSError:
+                pass
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """持久化的任务记录
+
+    每个任务保存为 ``root/<job_id>.json``，写入时先写临时文件再 rename，
+    进程在任意时刻退出都不会留下半个 JSON。服务重启后可以据此恢复未完成的任务。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        if not job_id or os.path.basename(job_id) != job_id or job_id.startswith('.'):
+            raise ValueError(f"Invalid job id: {job_id}")
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def save(self, job_id: str, data: Dict[str, Any]) -> None:
+        """原子地保存任务记录"""
+        path = self._path(job_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务记录，不存在或损坏时返回 None"""
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取任务记录失败 {job_id}: {str(e)}")
+            return None
+
+    def delete(self, job_id: str) -> None:
+        try:
+            os.remove(self._path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, max_age: float, keep: Optional[List[str]] = None) -> int:
+        """按文件修改时间删除超过 max_age 秒未更新的任务记录（keep 中的除外），返回删除的数量"""
+        now = time.time()
+        removed = 0
+        for filename in os.listdir(self.root):
+            if not filename.endswith('.json') or filename[:-len('.json')] in (keep or []):
+                continue
+            path = os.path.join(self.root, filename)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"删除 {removed} 个过期任务记录 {self.root}")
+        return removed
+
+    def list(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """列出任务记录（按修改时间倒序），可按 status 过滤"""
+        jobs = []
+        for filename in os.listdir(self.root):
+            if not filename.endswith('.json'):
+                continue
+            job = self.load(filename[:-len('.json')])
+            if job is not None and (statuses is None or job.get('status') in statuses):
+                jobs.append((os.path.getmtime(os.path.join(self.root, filename)), job))
+        jobs.sort(key=lambda item: item[0], reverse=True)
+        return [job for _, job in jobs]
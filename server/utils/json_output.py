@@ -0,0 +1,73 @@
+"""从模型输出中解析 JSON
+
+模型经常在 JSON 前后附带说明文字、用 ```json 代码块包裹，或照抄提示词示例里的 // 注释和尾随逗号，
+这里尽量容忍这些情况，解析失败时抛出 ValueError。
+"""
+import json
+import re
+from typing import Any
+
+_FENCE_PATTERN = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_TRAILING_COMMA_PATTERN = re.compile(r',(\s*[}\]])')
+
+
+def _strip_comments(text: str) -> str:
+    """去掉字符串之外的 // 行注释"""
+    result = []
+    in_string = False
+    escaped = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            result.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            result.append(ch)
+        elif text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = len(text) if newline < 0 else newline
+            continue
+        else:
+            result.append(ch)
+        i += 1
+    return ''.join(result)
+
+
+def _outermost(text: str) -> str:
+    """截取第一个 { 或 [ 到与之对应的最后一个 } 或 ] 之间的内容"""
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        raise ValueError('输出中没有 JSON 内容')
+    start = min(starts)
+    end = text.rfind('}' if text[start] == '{' else ']')
+    if end < start:
+        raise ValueError('JSON 内容不完整')
+    return text[start:end + 1]
+
+
+def parse_json_output(text: Any) -> Any:
+    """解析模型输出中的 JSON，已是 dict/list 时原样返回"""
+    if isinstance(text, (dict, list)):
+        return text
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError('输出为空')
+
+    fence = _FENCE_PATTERN.search(text)
+    candidate = fence.group(1) if fence else text
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+
+    candidate = _TRAILING_COMMA_PATTERN.sub(r'\1', _strip_comments(_outermost(candidate)))
+    try:
+        return json.loads(candidate)
+    except ValueError as e:
+        raise ValueError(f'无法解析 JSON：{str(e)}')
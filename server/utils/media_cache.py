@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL = 3600  # 只设置了 ttl 时，两次清理过期文件的最短间隔（秒）
+
+
+def link_or_copy(src_path: str, dest_path: str) -> None:
+    """原子地以硬链接（或复制）方式放置文件
+
+    先放到临时文件再 rename，既不会让读者看到半个文件，也不会因为目标文件
+    与缓存共享 inode 而在后续覆盖写入时污染缓存。
+    """
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class MediaCache:
+    """基于内容哈希的媒体文件缓存
+
+    文件按 key 存放在 ``root/<key前两位>/<key><suffix>``，命中时优先以硬链接
+    方式放入目标目录，跨文件系统等无法硬链接的情况退化为复制。
+    文件写入超过 ttl 秒视为过期；总大小超过 max_bytes 时按写入时间淘汰最旧的文件。
+    缓存文件可能与项目中的文件共享 inode，因此不用修改 mtime 的方式记录访问时间。两者为 0 时不限制。
+    """
+
+    def __init__(self, root: str, suffix: str = '', max_bytes: int = 0, ttl: float = 0):
+        self.root = root
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._size: Optional[int] = None  # 缓存总大小，首次写入时统计，之后按写入累加
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """根据任意可 JSON 序列化的内容生成缓存 key"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """获取 key 对应的缓存文件路径"""
+        return os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，命中时返回缓存文件路径"""
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size <= 0:
+            return None
+        if self.ttl and time.time() - stat.st_mtime > self.ttl:
+            self._remove(path)
+            return None
+        return path
+
+    def put(self, key: str, src_path: str) -> str:
+        """将已生成的文件放入缓存"""
+        cache_path = self.path_for(key)
+        if os.path.isfile(cache_path):
+            return cache_path
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        link_or_copy(src_path, cache_path)
+        self._added(cache_path)
+        return cache_path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        """将内存中的数据写入缓存"""
+        cache_path = self.path_for(key)
+        if os.path.isfile(cache_path):
+            return cache_path
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._added(cache_path)
+        return cache_path
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _added(self, path: str) -> None:
+        """记录新写入的文件，超出容量或距上次清理超过 PRUNE_INTERVAL 秒时清理"""
+        if not self.max_bytes and not self.ttl:
+            return
+        with self._lock:
+            if self._size is not None:
+                try:
+                    self._size += os.path.getsize(path)
+                except OSError:
+                    pass
+                over = self.max_bytes and self._size > self.max_bytes
+                due = self.ttl and time.time() - self._pruned_at > PRUNE_INTERVAL
+                if not over and not due:
+                    return
+        self.prune()
+
+    def prune(self) -> None:
+        """删除过期的文件，总大小超过 max_bytes 时从最旧的文件开始删除，直到回到上限的 90% 以下"""
+        now = time.time()
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith(self.suffix) or filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for mtime, size, path in files:
+            expired = self.ttl and now - mtime > self.ttl
+            if not expired and (not self.max_bytes or total <= target):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+            self._pruned_at = now
+        if removed:
+            logger.info(f"媒体缓存 {self.root} 淘汰 {removed} 个文件")
+
+    def materialize(self, key: str, dest_path: str) -> bool:
+        """将缓存文件放到目标路径，未命中返回 False"""
+        cache_path = self.get(key)
+        if not cache_path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            link_or_copy(cache_path, dest_path)
+            return True
+        except OSError as e:
+            logger.warning(f"缓存文件放置失败 {cache_path} -> {dest_path}: {str(e)}")
+            return False
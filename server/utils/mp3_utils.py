@@ -0,0 +1,147 @@
+"""MP3 帧级处理工具
+
+只解析帧头，不解码音频：用于按时间在帧边界上切分、以及无损拼接 MP3 数据。
+edge-tts 输出的是 24kHz 单声道 MPEG-2 Layer III（每帧 576 个采样，24ms）。
+"""
+from typing import Iterator, List, NamedTuple, Optional
+
+# 比特率表（kbps），按 (版本, 层) 区分
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# 采样率表，键为帧头中的版本位：3=MPEG1，2=MPEG2，0=MPEG2.5
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+
+class Frame(NamedTuple):
+    offset: int  # 在数据中的字节偏移
+    length: int  # 帧长度（字节）
+    start: float  # 开始时间（秒）
+    duration: float  # 时长（秒）
+
+
+def parse_frame_header(data: bytes, pos: int) -> Optional[tuple]:
+    """解析 pos 处的帧头，返回 (帧长度, 每帧采样数, 采样率)，不是合法帧头时返回 None。"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0x03
+    layer_bits = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    version = 1 if version_bits == 3 else 2
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 576 if layer == 3 and version == 2 else 1152
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+
+def skip_id3(data: bytes) -> int:
+    """跳过开头的 ID3v2 标签，返回第一帧可能开始的位置。"""
+    if len(data) >= 10 and data[:3] == b'ID3':
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def is_info_frame(data: bytes, frame: Frame) -> bool:
+    """是否为 Xing/Info/VBRI 头帧（不含音频，记录的是整个文件的帧数）。"""
+    head = data[frame.offset:frame.offset + min(frame.length, 64)]
+    return b'Xing' in head or b'Info' in head or b'VBRI' in head
+
+
+def iter_frames(data: bytes) -> Iterator[Frame]:
+    """依次返回数据中的音频帧，遇到损坏的数据时向后重新同步。"""
+    pos = skip_id3(data)
+    elapsed = 0.0
+    while pos + 4 <= len(data):
+        header = parse_frame_header(data, pos)
+        if header is None or pos + header[0] > len(data):
+            if data[pos:pos + 3] == b'TAG':
+                break  # ID3v1 标签位于文件末尾
+            pos += 1
+            continue
+        length, samples, sample_rate = header
+        duration = samples / sample_rate
+        yield Frame(pos, length, elapsed, duration)
+        elapsed += duration
+        pos += length
+
+
+def audio_frames(data: bytes) -> List[Frame]:
+    """数据中所有的音频帧（去掉 Xing/Info 头帧）。"""
+    frames = list(iter_frames(data))
+    if frames and is_info_frame(data, frames[0]):
+        shift = frames[0].duration
+        frames = [f._replace(start=f.start - shift) for f in frames[1:]]
+    return frames
+
+
+def duration(data: bytes) -> float:
+    """音频时长（秒）。"""
+    frames = audio_frames(data)
+    return frames[-1].start + frames[-1].duration if frames else 0.0
+
+
+def split_at_times(data: bytes, cut_times: List[float]) -> List[bytes]:
+    """在最接近各切分时间点的帧边界处切开，返回 len(cut_times) + 1 段纯帧数据。
+
+    切分时间需单调递增；切出的每段都不含 ID3 标签和 Xing 头帧，可直接作为独立 MP3 文件播放。
+    """
+    frames = audio_frames(data)
+    if not frames:
+        raise ValueError('no MPEG audio frames found')
+
+    boundaries = [0]
+    index = 0
+    for cut in cut_times:
+        while index < len(frames) and frames[index].start + frames[index].duration / 2 <= cut:
+            index += 1
+        boundaries.append(max(index, boundaries[-1]))
+    boundaries.append(len(frames))
+
+    pieces = []
+    for begin, end in zip(boundaries, boundaries[1:]):
+        if begin >= end:
+            pieces.append(b'')
+            continue
+        first, last = frames[begin], frames[end - 1]
+        pieces.append(data[first.offset:last.offset + last.length])
+    return pieces
+
+
+def trim(data: bytes, start: Optional[float] = None, end: Optional[float] = None) -> bytes:
+    """保留与 [start, end] 时间段有重叠的帧，去掉 ID3 标签和 Xing 头帧。"""
+    frames = [
+        f for f in audio_frames(data)
+        if (start is None or f.start + f.duration > start) and (end is None or f.start < end)
+    ]
+    if not frames:
+        return b''
+    return data[frames[0].offset:frames[-1].offset + frames[-1].length]
+
+
+def concat(parts: List[bytes]) -> bytes:
+    """按帧无损拼接多段 MP3。
+
+    每段的 ID3 标签和 Xing 头帧都会被去掉（否则播放器会按第一段的帧数计算总时长），
+    要求各段的采样率和声道一致，edge-tts 同一语音的输出满足这一点。
+    """
+    return b''.join(trim(part) for part in parts)
@@ -0,0 +1,185 @@
+"""Server-Sent Events 工具
+
+- format_event：按规范组装事件，多行内容拆成多个 data 行，客户端按换行拼回
+- coalesce：把逐 token 的小片段合并成较大的块再发送，减少写入次数和客户端重绘
+- SSEStreamRegistry：在后台运行事件流并保留已产出的事件，客户端断线后可凭 Last-Event-ID 续传
+"""
+import asyncio
+import uuid
+import logging
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(data: str, event_id: Optional[str] = None, event: Optional[str] = None) -> str:
+    """组装一个 SSE 事件"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    for line in data.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        lines.append(f"data: {line}")
+    return '\n'.join(lines) + '\n\n'
+
+
+async def coalesce(source: AsyncIterator[str], max_chars: int = 64, max_delay: float = 0.05) -> AsyncGenerator[str, None]:
+    """合并 source 产出的文本片段
+
+    缓冲的字符数达到 max_chars，或最早缓冲的片段已等待 max_delay 秒时产出一次；
+    等待期间没有新片段也会按时产出。两者都为 0 时逐个透传。
+    """
+    if max_chars <= 0 and max_delay <= 0:
+        async for chunk in source:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    iterator = source.__aiter__()
+    buffer: List[str] = []
+    size = 0
+    deadline: Optional[float] = None
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait([pending], timeout=timeout)
+            if done:
+                future, pending = pending, None
+                try:
+                    chunk = future.result()
+                except StopAsyncIteration:
+                    break
+                buffer.append(chunk)
+                size += len(chunk)
+                if deadline is None and max_delay > 0:
+                    deadline = loop.time() + max_delay
+                full = max_chars > 0 and size >= max_chars
+                expired = deadline is not None and loop.time() >= deadline
+                if not full and not expired:
+                    continue
+            if buffer:
+                yield ''.join(buffer)
+            buffer, size, deadline = [], 0, None
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait([pending])
+        if hasattr(iterator, 'aclose'):
+            await iterator.aclose()
+
+
+class SSEStream:
+    """在后台任务中运行的事件流
+
+    产出的每段数据按顺序编号（从 1 开始）并保留在内存中，订阅者可从任意序号之后开始读取。
+    最后一个订阅者断开时，grace 为 0 则立即取消（上游调用随之停止）；大于 0 时流继续运行 grace 秒
+    等待客户端续传，期间上游调用仍在计费，无人重连才取消。流结束后数据保留 grace 秒供续传，之后由 on_expire 移除。
+    """
+
+    def __init__(self, stream_id: str, source: AsyncIterator[str], grace: float, on_expire: Callable[[str], None]):
+        self.id = stream_id
+        self.grace = grace
+        self.events: List[str] = []
+        self.finished = False
+        self.cancelled = False
+        self.error: Optional[str] = None
+        self._on_expire = on_expire
+        self._subscribers = 0
+        self._idle_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.events.append(chunk)
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self.cancelled = True
+        except Exception as e:
+            logger.error(f"事件流 {self.id} 出错: {str(e)}")
+            self.error = str(e)
+        finally:
+            if hasattr(source, 'aclose'):
+                await source.aclose()
+            async with self._changed:
+                self.finished = True
+                self._changed.notify_all()
+            asyncio.get_running_loop().call_later(self.grace, self._on_expire, self.id)
+
+    async def subscribe(self, after: int = 0) -> AsyncGenerator[Tuple[int, str], None]:
+        """产出序号大于 after 的 (序号, 数据)，直到流结束"""
+        self._subscribers += 1
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        index = max(0, after)
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: len(self.events) > index or self.finished)
+                    batch = self.events[index:]
+                    finished = self.finished
+                for chunk in batch:
+                    index += 1
+                    yield index, chunk
+                if finished and index >= len(self.events):
+                    return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self.finished:
+                if self.grace > 0:
+                    self._idle_timer = asyncio.get_running_loop().call_later(self.grace, self.cancel)
+                else:
+                    self.cancel()
+
+    def cancel(self) -> None:
+        """取消流（上游生成随之取消）"""
+        if not self._task.done():
+            logger.info(f"取消事件流 {self.id}")
+            self._task.cancel()
+
+
+class SSEStreamRegistry:
+    """进程内的事件流登记，按 id 查找以支持 Last-Event-ID 续传；事件 id 的格式为 ``<流 id>:<序号>``"""
+
+    def __init__(self, grace: float = 15.0):
+        self.grace = grace
+        self._streams: Dict[str, SSEStream] = {}
+
+    def start(self, source: AsyncIterator[str]) -> SSEStream:
+        stream_id = uuid.uuid4().hex[:12]
+        stream = SSEStream(stream_id, source, self.grace, self._expire)
+        self._streams[stream_id] = stream
+        return stream
+
+    def _expire(self, stream_id: str) -> None:
+        stream = self._streams.get(stream_id)
+        if stream is not None and stream.finished:
+            del self._streams[stream_id]
+
+    def get(self, stream_id: str) -> Optional[SSEStream]:
+        return self._streams.get(stream_id)
+
+    def resolve(self, last_event_id: str) -> Tuple[Optional[SSEStream], int]:
+        """解析 Last-Event-ID，返回 (事件流, 已收到的序号)，流不存在时事件流为 None"""
+        stream_id, _, seq = (last_event_id or '').strip().partition(':')
+        try:
+            after = int(seq)
+        except ValueError:
+            return None, 0
+        return self._streams.get(stream_id), after
+
+    def cancel(self, stream_id: str) -> bool:
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return False
+        stream.cancel()
+        return True
@@ -0,0 +1,98 @@
+"""Token 数量估算
+
+安装了 tiktoken 时用 cl100k_base 编码计数；否则按字符粗略估计：
+中日韩字符每个约 1 个 token，其余字符约 4 个一个 token。估计值只用于限流，偏大比偏小安全。
+"""
+import logging
+import math
+import re
+from typing import Any, Iterable, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+_encoding = None
+_encoding_failed = False  # 编码加载失败后不再重试，之后一直按字符估计
+MESSAGE_OVERHEAD = 4  # 每条消息的角色和分隔符开销
+
+
+def _get_encoding():
+    """返回 cl100k_base 编码，不可用时返回 None
+
+    编码文件首次使用时需要下载且没有超时，失败一次后就记下来，避免每次计数都重新下载、阻塞事件循环。
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"tiktoken 编码加载失败，改用字符估计 token 数：{str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """估算一段文本的 token 数"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def count_message_tokens(messages: Iterable[Any]) -> int:
+    """估算消息列表的 token 数，支持 LangChain 消息对象和 {'content': ...} 字典"""
+    total = 0
+    for message in messages:
+        content = message.get('content', '') if isinstance(message, dict) else getattr(message, 'content', message)
+        total += count_tokens(content if isinstance(content, str) else str(content)) + MESSAGE_OVERHEAD
+    return total
+
+
+def pack_sentences(sentences: List[str], max_tokens: int, overlap_tokens: int = 0) -> List[Tuple[str, str]]:
+    """按 token 预算把句子装成若干块，返回 [(上文, 块文本)]
+
+    块只在句子边界切分，每块不超过 max_tokens（单句超过预算时独占一块）。每块按剩余总量估算块数，
+    填到平均值附近，避免最后一块过小，使并行的各块请求大小接近。
+    overlap_tokens > 0 时，每块附带上一块末尾不超过该预算的若干句作为上文。
+    """
+    if not sentences:
+        return []
+    counts = [count_tokens(sentence) for sentence in sentences]
+    total = sum(counts)
+
+    def group_target(remaining: int) -> float:
+        return remaining / max(1, math.ceil(remaining / max_tokens))
+
+    groups: List[List[int]] = [[]]
+    size = 0
+    remaining = total
+    target = group_target(remaining)
+    for index, tokens in enumerate(counts):
+        if groups[-1] and (size + tokens > max_tokens or size + tokens / 2 > target):
+            groups.append([])
+            remaining -= size
+            target = group_target(remaining)
+            size = 0
+        groups[-1].append(index)
+        size += tokens
+
+    chunks = []
+    for number, group in enumerate(groups):
+        context: List[str] = []
+        if overlap_tokens > 0 and number > 0:
+            budget = overlap_tokens
+            for index in reversed(groups[number - 1]):
+                budget -= counts[index]
+                if budget < 0:
+                    break
+                context.insert(0, sentences[index])
+        chunks.append(("\n".join(context), "\n".join(sentences[index] for index in group)))
+    return chunks
@@ -0,0 +1,186 @@
+import copy
+import json
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 可被 ImageService 改写的输入：节点类型 -> 输入名
+PATCHABLE_INPUTS = {
+    'CLIPTextEncode': ['text'],
+    'CLIPTextEncodeFlux': ['clip_l', 't5xxl'],
+    'KSampler': ['seed'],
+    'RandomNoise': ['noise_seed'],
+    'EmptyLatentImage': ['width', 'height', 'batch_size'],
+}
+
+
+class WorkflowRegistry:
+    """工作流索引
+
+    扫描工作流目录，为每个 JSON 文件解析一次并缓存元数据（采样器、尺寸、节点摘要、
+    可改写的输入）和工作流内容。之后按 mtime/size 只重新解析发生变化的文件，
+    目录扫描本身也按 refresh_interval 限频，列表接口因此与工作流数量和大小无关。
+    解析失败的文件同样按 mtime/size 记下，文件修改之前不再重复解析和记录错误。
+    """
+
+    def __init__(self, workflow_dir: str, refresh_interval: float = 2.0):
+        self.workflow_dir = workflow_dir
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}  # 文件名 -> {'stat', 'metadata', 'workflow'}
+        self._failed: Dict[str, tuple] = {}  # 解析失败的文件名 -> 失败时的 (mtime, size)
+        self._summaries: List[Dict[str, Any]] = []
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        """重新扫描目录，只解析新增或修改过的文件。"""
+        with self._lock:
+            if not force and time.monotonic() - self._last_scan < self.refresh_interval:
+                return
+            self._last_scan = time.monotonic()
+
+            try:
+                filenames = [f for f in os.listdir(self.workflow_dir) if f.endswith('.json')]
+            except OSError:
+                filenames = []
+
+            changed = False
+            entries = {}
+            failed = {}
+            for filename in filenames:
+                path = os.path.join(self.workflow_dir, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature = (stat.st_mtime, stat.st_size)
+                if self._failed.get(filename) == signature:
+                    failed[filename] = signature
+                    continue
+                entry = self._entries.get(filename)
+                if entry is None or entry['stat'] != signature:
+                    entry = self._index(filename, path, signature)
+                    changed = True
+                if entry is not None:
+                    entries[filename] = entry
+                else:
+                    failed[filename] = signature
+
+            changed = changed or entries.keys() != self._entries.keys()
+            self._entries = entries
+            self._failed = failed
+            if changed:
+                self._summaries = sorted(
+                    (self._summary(entry['metadata']) for entry in entries.values()),
+                    key=lambda x: x['name']
+                )
+
+    def _index(self, filename: str, path: str, signature: tuple) -> Optional[Dict[str, Any]]:
+        """解析单个工作流文件并提取元数据。"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                workflow = json.load(f)
+            if not isinstance(workflow, dict):
+                raise ValueError('workflow must be a JSON object')
+        except Exception as e:
+            logger.error(f"Error loading workflow {filename}: {str(e)}")
+            return None
+
+        metadata = {
+            'name': filename,
+            'path': path,
+            'size': signature[1],
+            'modified': signature[0],
+            'node_count': 0,
+            'node_types': {},
+            'patchable': [],
+            'nodes': {}
+        }
+        for node_id, node in workflow.items():
+            if not isinstance(node, dict):
+                continue
+            class_type = node.get('class_type')
+            inputs = node.get('inputs', {})
+            metadata['node_count'] += 1
+            metadata['node_types'][class_type] = metadata['node_types'].get(class_type, 0) + 1
+            metadata['nodes'][node_id] = {
+                'type': class_type,
+                'title': node.get('_meta', {}).get('title'),
+                'inputs': inputs
+            }
+            for input_name in PATCHABLE_INPUTS.get(class_type, []):
+                if input_name in inputs:
+                    metadata['patchable'].append({'node': node_id, 'type': class_type, 'input': input_name})
+
+            if class_type == 'KSampler':
+                metadata['sampler'] = inputs.get('sampler_name')
+                metadata['scheduler'] = inputs.get('scheduler')
+                metadata['steps'] = inputs.get('steps')
+            elif class_type == 'EmptyLatentImage':
+                metadata['width'] = inputs.get('width')
+                metadata['height'] = inputs.get('height')
+
+        return {'stat': signature, 'metadata': metadata, 'workflow': workflow}
+
+    @staticmethod
+    def _summary(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """列表接口使用的精简元数据（不含节点详情）。"""
+        return {k: v for k, v in metadata.items() if k != 'nodes'}
+
+    def _resolve(self, name: str) -> Optional[str]:
+        if name in self._entries:
+            return name
+        if not name.endswith('.json') and name + '.json' in self._entries:
+            return name + '.json'
+        return None
+
+    def names(self) -> List[str]:
+        """所有工作流文件名。"""
+        self.refresh()
+        return [summary['name'] for summary in self._summaries]
+
+    def list_workflows(self) -> List[Dict[str, Any]]:
+        """所有工作流的元数据摘要，按名称排序。"""
+        self.refresh()
+        return list(self._summaries)
+
+    def exists(self, name: str) -> bool:
+        self.refresh()
+        return self._resolve(name) is not None
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """工作流详情：完整元数据和工作流内容的副本。"""
+        self.refresh()
+        filename = self._resolve(name)
+        if filename is None:
+            return None
+        entry = self._entries[filename]
+        return copy.deepcopy({
+            'metadata': entry['metadata'],
+            'workflow': entry['workflow']
+        })
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """获取工作流内容的副本，调用方可以自由修改。"""
+        self.refresh()
+        filename = self._resolve(name)
+        if filename is None:
+            return None
+        return copy.deepcopy(self._entries[filename]['workflow'])
+
+
+_registries: Dict[str, WorkflowRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_workflow_registry(workflow_dir: str) -> WorkflowRegistry:
+    """按目录获取共享的工作流索引。"""
+    workflow_dir = os.path.abspath(workflow_dir)
+    with _registries_lock:
+        if workflow_dir not in _registries:
+            _registries[workflow_dir] = WorkflowRegistry(workflow_dir)
+        return _registries[workflow_dir]